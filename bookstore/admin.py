@@ -1,9 +1,89 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from .models import Author, Book, Category
-from django.contrib import admin
-from django.utils.html import format_html
-from .models import Order, OrderItem
+from .exports import export_response
+from .models import BookSales, CategorySales, DailySales, Order, OrderItem
+from .orders import set_order_status
+from .sales import sync_sales
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for big tables. An unfiltered changelist takes its count from
+    the id range, two index lookups, instead of COUNT(*) over every row.
+    Gaps left by deletes make it an overestimate, so it is only used above
+    BOOKSTORE_ADMIN_EXACT_COUNT_LIMIT rows; filtered lists count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+            if bounds['high'] is None:
+                return 0
+            estimate = bounds['high'] - bounds['low'] + 1
+            if estimate > getattr(settings, 'BOOKSTORE_ADMIN_EXACT_COUNT_LIMIT', 100000):
+                return estimate
+        return queryset.count()
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter on a foreign key or many-to-many field that searches the
+    related model's admin, instead of listing every related row. That admin
+    needs search_fields, and the ModelAdmin must add `autocomplete_media`.
+    """
+    template = 'admin/bookstore/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.parameter_name = f'{self.field_name}__id__exact'
+        self.title = self.field.verbose_name
+        super().__init__(request, params, model, model_admin)
+        self.form_field = forms.ModelChoiceField(
+            queryset=self.field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(self.field, model_admin.admin_site),
+            required=False,
+        )
+
+    def lookups(self, request, model_admin):
+        # Choices come from the autocomplete view, not the sidebar
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+        }
+
+    def widget(self):
+        # Renders the one selected row, if any
+        return self.form_field.widget.render(self.parameter_name, self.value(), attrs={
+            'id': f'autocomplete-filter-{self.field_name}',
+            'style': 'width: 100%',
+        })
+
+
+def autocomplete_media(field):
+    return AutocompleteSelect(field, admin.site).media
+
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
@@ -13,28 +93,44 @@ class AuthorAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at', 'photo_preview']
     
     def book_count(self, obj):
-        return obj.books.count()
+        return obj.book_count
     book_count.short_description = 'Number of Books'
+    book_count.admin_order_field = 'book_count'
     
     def photo_preview(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 50%;" />', obj.photo.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 50%;" />', obj.photo_thumbnail_small)
         return "No Photo"
     photo_preview.short_description = 'Photo Preview'
 
+class AuthorFilter(AutocompleteFilter):
+    field_name = 'author'
+
+
+class CategoryFilter(AutocompleteFilter):
+    field_name = 'categories'
+
+
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'price', 'stock_quantity', 'cover_preview', 'created_at']
-    list_filter = ['author', 'categories', 'created_at']
+    list_select_related = ['author']
+    list_filter = [AuthorFilter, CategoryFilter, 'created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ['title', 'author__name', 'isbn']
     filter_horizontal = ['categories']
     readonly_fields = ['created_at', 'updated_at', 'cover_preview']
     
     def cover_preview(self, obj):
         if obj.cover_image:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.cover_image.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.cover_thumbnail_small)
         return "No Cover"
     cover_preview.short_description = 'Cover Preview'
+
+    @property
+    def media(self):
+        return super().media + autocomplete_media(Book._meta.get_field('author'))
     
     fieldsets = (
         ('Basic Information', {
@@ -61,19 +157,42 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name']
     
     def book_count(self, obj):
-        return obj.books.count()
+        return obj.book_count
     book_count.short_description = 'Number of Books'
+    book_count.admin_order_field = 'book_count'
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = [
         'id', 'customer_name', 'email', 'total_amount', 
-        'status_badge', 'created_at'
+        'line_count', 'status_badge', 'created_at'
     ]
     list_filter = ['status', 'created_at', 'country']
-    search_fields = ['email', 'first_name', 'last_name', 'id']
-    readonly_fields = ['created_at', 'updated_at']
+    search_fields = ['email', 'first_name', 'last_name']
+    readonly_fields = ['created_at', 'updated_at', 'stock_committed', 'sales_recorded']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # A correlated subquery, so only the rows on the page are counted;
+        # a JOIN and GROUP BY would aggregate the whole table first
+        lines = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+            count=Count('id')
+        ).values('count')
+        return super().get_queryset(request).annotate(line_count=Coalesce(Subquery(lines), 0))
+
+    def line_count(self, obj):
+        return obj.line_count
+    line_count.short_description = 'Lines'
+
+    def get_search_results(self, request, queryset, search_term):
+        # An order number is looked up on the primary key; searching it as
+        # text would CAST every id
+        term = search_term.strip().lstrip('#')
+        if term.isdigit():
+            return queryset.filter(id=int(term)), False
+        return super().get_search_results(request, queryset, search_term)
     
     def customer_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
@@ -94,32 +213,92 @@ class OrderAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = 'Status'
 
-    actions = ['mark_as_processing', 'mark_as_shipped', 'mark_as_delivered']
+    actions = [
+        'mark_as_processing', 'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled',
+        'export_as_csv', 'export_as_jsonl',
+    ]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            sync_sales([obj.id])
     
     def mark_as_processing(self, request, queryset):
-        updated = queryset.update(status='processing')
+        updated = set_order_status(queryset.values_list('id', flat=True), 'processing')
         self.message_user(request, f'{updated} orders marked as processing.')
     mark_as_processing.short_description = "Mark selected orders as processing"
     
     def mark_as_shipped(self, request, queryset):
-        updated = queryset.update(status='shipped')
+        updated = set_order_status(queryset.values_list('id', flat=True), 'shipped')
         self.message_user(request, f'{updated} orders marked as shipped.')
     mark_as_shipped.short_description = "Mark selected orders as shipped"
     
     def mark_as_delivered(self, request, queryset):
-        updated = queryset.update(status='delivered')
+        updated = set_order_status(queryset.values_list('id', flat=True), 'delivered')
         self.message_user(request, f'{updated} orders marked as delivered.')
     mark_as_delivered.short_description = "Mark selected orders as delivered"
 
+    def mark_as_cancelled(self, request, queryset):
+        updated = set_order_status(queryset.values_list('id', flat=True), 'cancelled')
+        self.message_user(request, f'{updated} orders marked as cancelled.')
+    mark_as_cancelled.short_description = "Mark selected orders as cancelled"
+
+    # Filter the list by status and date, then "select all" to export the lot
+    def export_as_csv(self, request, queryset):
+        return export_response(request, queryset, 'csv')
+    export_as_csv.short_description = "Export lines of selected orders as CSV"
+
+    def export_as_jsonl(self, request, queryset):
+        return export_response(request, queryset, 'jsonl')
+    export_as_jsonl.short_description = "Export lines of selected orders as JSON Lines"
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ['order_id', 'book_title', 'quantity', 'price', 'subtotal']
+    list_display = ['order_number', 'book_title', 'quantity', 'price', 'subtotal']
+    # The row checkbox's label is str(item), which reads the book
+    list_select_related = ['book']
     list_filter = ['order__status', 'order__created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
-    def order_id(self, obj):
-        return obj.order.id
-    order_id.short_description = 'Order #'
+    def order_number(self, obj):
+        return obj.order_id
+    order_number.short_description = 'Order #'
+    order_number.admin_order_field = 'order_id'
     
     def book_title(self, obj):
         return obj.book.title
     book_title.short_description = 'Book'
+    book_title.admin_order_field = 'book__title'
+
+
+class SalesRollupAdmin(admin.ModelAdmin):
+    """Rollups are derived data; only the sales code writes to them"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(SalesRollupAdmin):
+    list_display = ['date', 'orders', 'units', 'revenue']
+    date_hierarchy = 'date'
+
+
+@admin.register(BookSales)
+class BookSalesAdmin(SalesRollupAdmin):
+    list_display = ['book', 'units', 'revenue']
+    list_select_related = ['book']
+    search_fields = ['book__title']
+
+
+@admin.register(CategorySales)
+class CategorySalesAdmin(SalesRollupAdmin):
+    list_display = ['category', 'units', 'revenue']
+    list_select_related = ['category']
@@ -0,0 +1,177 @@
+"""
+Read-only JSON API over the catalog for the site's own scripts.
+
+Rows come straight from .values(), so no model instances are built, and
+responses are streamed page by page with a forward cursor, through
+bookstore.streaming so ASGI doesn't buffer them. `?fields=` picks the
+keys returned; `?limit=` sets the page size, up to
+BOOKSTORE_API_MAX_PAGE_SIZE.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .models import Author, Book, Category
+from .pagination import KeysetPaginator, get_page_size
+from .search import get_search_backend
+from .streaming import streaming_response
+from .views import BOOK_ORDERING
+
+# Public field name -> ORM lookup passed to .values()
+BOOK_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'price': 'price',
+    'isbn': 'isbn',
+    'stock_quantity': 'stock_quantity',
+    'publication_date': 'publication_date',
+    'author_id': 'author_id',
+    'author': 'author__name',
+    'updated_at': 'updated_at',
+}
+AUTHOR_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'bio': 'bio',
+    'book_count': 'book_count',
+    'updated_at': 'updated_at',
+}
+CATEGORY_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'book_count': 'book_count',
+    'updated_at': 'updated_at',
+}
+# Books also offer `categories`, a list of category ids read per chunk
+BOOK_EXTRA_FIELDS = ('categories',)
+
+CHUNK_SIZE = 500
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def get_max_page_size():
+    return getattr(settings, 'BOOKSTORE_API_MAX_PAGE_SIZE', 1000)
+
+
+def parse_fields(request, available, extra=()):
+    requested = request.GET.get('fields', '').strip()
+    if not requested:
+        return list(available) + list(extra)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available and name not in extra]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_limit(request):
+    limit = request.GET.get('limit')
+    if not limit:
+        return get_page_size()
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise BadRequest('limit must be a number')
+    return max(1, min(limit, get_max_page_size()))
+
+
+def with_categories(rows):
+    """Add each book's category ids, one through-table query per chunk of rows"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield from _attach_categories(chunk)
+            chunk = []
+    yield from _attach_categories(chunk)
+
+
+def _attach_categories(rows):
+    if not rows:
+        return rows
+    categories = {row['id']: [] for row in rows}
+    links = Book.categories.through.objects.filter(book_id__in=list(categories)).values_list(
+        'book_id', 'category_id'
+    ).order_by('category_id')
+    for book_id, category_id in links:
+        categories[book_id].append(category_id)
+    for row in rows:
+        row['categories'] = categories[row['id']]
+    return rows
+
+
+def stream_json(stream, rows, fields, lookups):
+    """Yield a {"results": [...], "next": ...} document a row at a time"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield '{"results":['
+    for index, row in enumerate(rows):
+        item = {name: row[lookups.get(name, name)] for name in fields}
+        yield (',' if index else '') + encoder.encode(item)
+    yield '],"next":%s}' % json.dumps(stream.next_cursor)
+
+
+def catalog_response(request, queryset, ordering, available, extra=()):
+    try:
+        fields = parse_fields(request, available, extra)
+        per_page = parse_limit(request)
+    except BadRequest as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    # The ordering fields ride along so the paginator can build the cursor
+    lookups = {name: available[name] for name in fields if name in available}
+    columns = set(lookups.values()) | {field.lstrip('-') for field in ordering}
+    if 'categories' in fields:
+        columns.add('id')
+    queryset = queryset.values(*columns)
+
+    stream = KeysetPaginator(queryset, ordering, per_page).stream_page(request.GET.get('cursor'), CHUNK_SIZE)
+    rows = with_categories(stream) if 'categories' in fields else stream
+    response = streaming_response(request, stream_json(stream, rows, fields, lookups), content_type='application/json')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+def book_list(request):
+    """Books, with the search/category/author filters of the catalog page"""
+    books = Book.objects.all()
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        books = get_search_backend().search(books, search_query)
+
+    category_filter = request.GET.get('category', '')
+    author_filter = request.GET.get('author', '')
+    if not all(value.isdigit() for value in (category_filter, author_filter) if value):
+        return JsonResponse({'error': 'category and author must be ids'}, status=400)
+    if category_filter:
+        books = books.filter(categories__id=category_filter)
+    if author_filter:
+        books = books.filter(author__id=author_filter)
+
+    ordering = ('search_rank', 'id') if search_query else BOOK_ORDERING
+    return catalog_response(request, books, ordering, BOOK_FIELDS, BOOK_EXTRA_FIELDS)
+
+
+def name_filter(request, queryset):
+    # Lets the catalog page's facets reach names beyond their top N
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        queryset = queryset.filter(name__icontains=search_query)
+    return queryset
+
+
+@require_GET
+def author_list(request):
+    return catalog_response(request, name_filter(request, Author.objects.all()), ('name', 'id'), AUTHOR_FIELDS)
+
+
+@require_GET
+def category_list(request):
+    return catalog_response(request, name_filter(request, Category.objects.all()), ('name', 'id'), CATEGORY_FIELDS)
@@ -5,3 +5,11 @@ class BookstoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bookstore'
     # verbose_name = 'Online Bookstore'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from .instrumentation import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,134 @@
+"""
+Async versions of the read-only catalog views, for ASGI deployments.
+
+Queries go through Django's async ORM. Templates still render in a worker
+thread (sync_to_async) because context processors and lazy objects such as
+request.user, messages and the cart badge touch the database synchronously.
+Cart and checkout views stay in views.py on the sync path.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.shortcuts import aget_object_or_404, render
+
+from .conditional import (
+    author_detail_modified, book_detail_modified, book_list_modified, category_detail_modified, conditional_page,
+)
+from .facets import catalog_facets
+from .models import Author, Book, Category, Order
+from .pagination import KeysetPaginator
+from .recommendations import recommendations_for
+from .search import get_search_backend
+from .views import BOOK_ORDERING, facet_groups, page_to_json, wants_json
+
+arender = sync_to_async(render)
+
+
+@sync_to_async
+def search_books(books, query):
+    # Resolving the backend looks for the FTS table
+    return get_search_backend().search(books, query)
+
+
+@conditional_page(book_list_modified)
+async def book_list(request):
+    books = Book.objects.select_related('author').prefetch_related('categories')
+
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        books = await search_books(books, search_query)
+
+    category_filter = request.GET.get('category', '')
+    if category_filter:
+        books = books.filter(categories__id=category_filter)
+
+    author_filter = request.GET.get('author', '')
+    if author_filter:
+        books = books.filter(author__id=author_filter)
+
+    ordering = ('search_rank', 'id') if search_query else BOOK_ORDERING
+    page = await KeysetPaginator(books, ordering).aget_page(request.GET.get('cursor'))
+    if wants_json(request):
+        return page_to_json(page)
+
+    facets = await sync_to_async(catalog_facets)(search_query, category_filter, author_filter)
+    context = {
+        'books': page.object_list,
+        'page': page,
+        'categories': facets['categories'],
+        'authors': facets['authors'],
+        'facet_groups': facet_groups(facets, category_filter, author_filter),
+        'search_query': search_query,
+        'selected_category': category_filter,
+        'selected_author': author_filter,
+    }
+    return await arender(request, 'bookstore/book_list.html', context)
+
+
+@conditional_page(author_detail_modified)
+async def author_detail(request, author_id):
+    author = await aget_object_or_404(Author, id=author_id)
+    books = author.books.select_related('author').prefetch_related('categories')
+    page = await KeysetPaginator(books, BOOK_ORDERING).aget_page(request.GET.get('cursor'))
+    if wants_json(request):
+        return page_to_json(page)
+    return await arender(request, 'bookstore/author_detail.html', {
+        'author': author,
+        'books': page.object_list,
+        'page': page,
+    })
+
+
+@conditional_page(category_detail_modified)
+async def category_detail(request, category_id):
+    category = await aget_object_or_404(Category, id=category_id)
+    books = category.books.select_related('author').prefetch_related('categories')
+    page = await KeysetPaginator(books, BOOK_ORDERING).aget_page(request.GET.get('cursor'))
+    if wants_json(request):
+        return page_to_json(page)
+    return await arender(request, 'bookstore/category_detail.html', {
+        'category': category,
+        'books': page.object_list,
+        'page': page,
+    })
+
+
+@conditional_page(book_detail_modified)
+async def book_detail(request, book_id):
+    book = await aget_object_or_404(
+        Book.objects.select_related('author').prefetch_related('categories'), id=book_id
+    )
+    return await arender(request, 'bookstore/book_detail.html', {
+        'book': book,
+        'recommendations': await sync_to_async(recommendations_for)(book),
+    })
+
+
+async def author_list(request):
+    page = await KeysetPaginator(Author.objects.all(), ('name', 'id')).aget_page(request.GET.get('cursor'))
+    return await arender(request, 'bookstore/author_list.html', {
+        'authors': page.object_list,
+        'page': page,
+    })
+
+
+async def category_list(request):
+    categories = [category async for category in Category.objects.all().order_by('name')]
+    return await arender(request, 'bookstore/category_list.html', {
+        'categories': categories
+    })
+
+
+async def track_order(request):
+    """Customer order tracking"""
+    order = None
+
+    if request.method == 'POST':
+        order_id = request.POST.get('order_id')
+        email = request.POST.get('email')
+
+        try:
+            order = await Order.objects.aget(id=order_id, email=email)
+        except Order.DoesNotExist:
+            messages.error(request, 'Order not found. Please check your order ID and email.')
+
+    return await arender(request, 'bookstore/track_order.html', {'order': order})
@@ -0,0 +1,223 @@
+"""
+Per-process prefix index for search-as-you-type.
+
+Every worker keeps a sorted list of keys for book titles (one per word,
+so "potter" finds "Harry Potter"), author names and ISBNs, and answers
+prefixes with a bisect and a short scan. Lookups never touch the database
+and never wait for a rebuild:
+
+- a save or delete patches this worker's index once it commits, by
+  swapping in an updated copy, and bumps a version in the default cache
+- other workers see the new version, or an index older than
+  BOOKSTORE_AUTOCOMPLETE_MAX_AGE, and rebuild in a background thread while
+  they keep answering from the copy they have
+
+Only the first build in a worker blocks, and warm_index() does that at
+startup. The version only reaches other workers through a shared cache;
+`check --deploy` warns (bookstore.W001) when the cache is per-process.
+"""
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+
+from .models import Author, Book
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'autocomplete:version'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall((text or '').casefold()))
+
+
+def word_keys(text):
+    """The text from each word on, flagged True unless it is the whole text"""
+    key = normalize(text)
+    for match in _WORD_RE.finditer(key):
+        yield key[match.start():], match.start() > 0
+
+
+def book_entries(rows):
+    """(key, later_word, entry) for (id, title, isbn) rows"""
+    for book_id, title, isbn in rows:
+        entry = ('book', book_id, title, isbn)
+        for key, later_word in word_keys(title):
+            yield key, later_word, entry
+        if isbn:
+            yield isbn, False, entry
+
+
+def author_entries(rows):
+    """(key, later_word, entry) for (id, name) rows"""
+    for author_id, name in rows:
+        entry = ('author', author_id, name, '')
+        for key, later_word in word_keys(name):
+            yield key, later_word, entry
+
+
+class AutocompleteIndex:
+    """Sorted (key, entry) pairs; entries are (kind, id, label, isbn)"""
+
+    def __init__(self, version, entries, built_at=None):
+        self.version = version
+        self.built_at = time.monotonic() if built_at is None else built_at
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _, _ in entries]
+        self.entries = [(later_word, entry) for _, later_word, entry in entries]
+
+    @classmethod
+    def build(cls, version):
+        entries = list(book_entries(Book.objects.values_list('id', 'title', 'isbn').iterator(chunk_size=2000)))
+        entries.extend(author_entries(Author.objects.values_list('id', 'name').iterator(chunk_size=2000)))
+        return cls(version, entries)
+
+    def replace(self, version, identities, entries):
+        """A copy with every entry of the (kind, id) `identities` swapped for `entries`"""
+        kept = [
+            (key, later_word, entry)
+            for key, (later_word, entry) in zip(self.keys, self.entries)
+            if entry[:2] not in identities
+        ]
+        # Still as old as the last full build: other workers' edits aren't in it
+        return AutocompleteIndex(version, kept + list(entries), self.built_at)
+
+    def lookup(self, query, limit=8):
+        """Best `limit` entries whose key starts with `query`"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        scan = getattr(settings, 'BOOKSTORE_AUTOCOMPLETE_SCAN', 200)
+        matches = {}
+        position = bisect_left(self.keys, prefix)
+        for key, (later_word, entry) in zip(self.keys[position:position + scan], self.entries[position:position + scan]):
+            if not key.startswith(prefix):
+                break
+            identity = entry[:2]
+            if identity not in matches or not later_word:
+                matches[identity] = (later_word, entry)
+        # Matches from the first word first, then shorter labels
+        ranked = sorted(matches.values(), key=lambda match: (match[0], len(match[1][2]), match[1][2]))
+        return [entry for _, entry in ranked[:limit]]
+
+
+def index_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def _bump_version():
+    """The new version, or None if the key had to be recreated"""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        return None
+
+
+_index = None
+_lock = threading.Lock()
+_rebuilding = False
+
+
+def is_stale(index, version):
+    max_age = getattr(settings, 'BOOKSTORE_AUTOCOMPLETE_MAX_AGE', 60 * 5)
+    return index.version != version or bool(max_age and time.monotonic() - index.built_at > max_age)
+
+
+def get_index():
+    """This worker's index; a stale one is still returned while a new one builds"""
+    global _index
+    version = index_version()
+    index = _index
+    if index is None:
+        with _lock:
+            if _index is None:
+                _index = AutocompleteIndex.build(version)
+            return _index
+    if is_stale(index, version):
+        rebuild_in_background()
+    return index
+
+
+def refresh_index():
+    """Build a new index and swap it in"""
+    global _index
+    # Read first: a change committed during the build leaves it stale
+    index = AutocompleteIndex.build(index_version())
+    with _lock:
+        _index = index
+    return index
+
+
+def rebuild_in_background():
+    global _rebuilding
+    with _lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    def rebuild():
+        global _rebuilding
+        try:
+            refresh_index()
+        except DatabaseError:
+            logger.warning("Could not rebuild the autocomplete index", exc_info=True)
+        finally:
+            _rebuilding = False
+            # The thread's own connections
+            connections.close_all()
+
+    threading.Thread(target=rebuild, name='autocomplete-rebuild', daemon=True).start()
+
+
+def update_on_commit(kind, ids, deleted=False):
+    """
+    Once the transaction commits, patch this worker's index for the 'book'
+    or 'author' `ids` and bump the version so other workers rebuild
+    """
+    ids = list(ids)
+
+    def update():
+        global _index
+        version = _bump_version()
+        if _index is None:
+            return
+        try:
+            if deleted:
+                entries = []
+            elif kind == 'book':
+                entries = list(book_entries(Book.objects.filter(id__in=ids).values_list('id', 'title', 'isbn')))
+            else:
+                entries = list(author_entries(Author.objects.filter(id__in=ids).values_list('id', 'name')))
+        except DatabaseError:
+            # Left stale by the bump, so the next lookup rebuilds it
+            logger.warning("Could not update the autocomplete index for %s %s", kind, ids, exc_info=True)
+            return
+        with _lock:
+            index = _index
+            # Only take the new version if no other worker's change is missing
+            if version is None or index.version != version - 1:
+                version = index.version
+            _index = index.replace(version, {(kind, id) for id in ids}, entries)
+
+    transaction.on_commit(update)
+
+
+def warm_index():
+    """Build the index as a worker starts, so no visitor waits for it"""
+    try:
+        get_index()
+    except DatabaseError:
+        logger.warning("Could not build the autocomplete index; it will be built on first use", exc_info=True)
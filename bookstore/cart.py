@@ -0,0 +1,207 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Book, Cart, CartItem
+
+COOKIE_NAME = 'cart'
+COOKIE_SALT = 'bookstore.cart'
+
+
+def uses_cookie_cart(request):
+    """Anonymous carts live in a signed cookie when the cookie backend is on"""
+    return getattr(settings, 'BOOKSTORE_CART_BACKEND', 'database') == 'cookie' and not request.user.is_authenticated
+
+
+def _count_cache_key(user_id=None, session_key=None):
+    if user_id:
+        return f'bookstore:cart-count:user:{user_id}'
+    if session_key:
+        return f'bookstore:cart-count:session:{session_key}'
+    return None
+
+
+def cart_count_cache_key(cart):
+    return _count_cache_key(cart.user_id, cart.session_key)
+
+
+def cart_totals(cart_items):
+    """(total quantity, total price) of already-loaded cart items"""
+    return (
+        sum(item.quantity for item in cart_items),
+        sum((item.subtotal for item in cart_items), 0),
+    )
+
+
+def get_cart_item_count(request):
+    """Number of lines in the visitor's cart, served from cache when possible"""
+    if uses_cookie_cart(request):
+        return get_cookie_cart(request).count
+    if request.user.is_authenticated:
+        key = _count_cache_key(user_id=request.user.id)
+        lookup = {'cart__user_id': request.user.id}
+    else:
+        session_key = request.session.session_key
+        if not session_key:
+            return 0
+        key = _count_cache_key(session_key=session_key)
+        lookup = {'cart__session_key': session_key}
+
+    count = cache.get(key)
+    if count is None:
+        count = CartItem.objects.filter(**lookup).count()
+        cache.set(key, count, getattr(settings, 'BOOKSTORE_CART_COUNT_TIMEOUT', 60 * 60))
+    return count
+
+
+def invalidate_cart_count(cart):
+    key = cart_count_cache_key(cart)
+    if key:
+        cache.delete(key)
+
+
+class CookieCartItem:
+    """Stand-in for CartItem; `id` is the book id so cart URLs work unchanged"""
+
+    def __init__(self, book, quantity):
+        self.id = self.book_id = book.id
+        self.book = book
+        self.quantity = quantity
+
+    @property
+    def subtotal(self):
+        return self.book.price * self.quantity
+
+
+class CookieCart:
+    """
+    {book_id: quantity} carried in a signed cookie, so anonymous browsing
+    never writes a session or Cart row. CookieCartMiddleware writes the
+    cookie back when it changes.
+    """
+
+    def __init__(self, request):
+        self.lines = self.decode(request.get_signed_cookie(COOKIE_NAME, '', salt=COOKIE_SALT, max_age=self.max_age()))
+        self.modified = False
+
+    @staticmethod
+    def max_age():
+        return getattr(settings, 'BOOKSTORE_COOKIE_CART_AGE', 60 * 60 * 24 * 30)
+
+    @staticmethod
+    def max_lines():
+        return getattr(settings, 'BOOKSTORE_COOKIE_CART_MAX_LINES', 50)
+
+    @classmethod
+    def decode(cls, value):
+        """'12-1.34-2' -> {12: 1, 34: 2}; anything malformed is dropped"""
+        lines = {}
+        for part in value.split('.'):
+            book_id, _, quantity = part.partition('-')
+            if book_id.isdigit() and quantity.isdigit() and int(quantity) > 0:
+                lines[int(book_id)] = int(quantity)
+        return dict(list(lines.items())[:cls.max_lines()])
+
+    def encode(self):
+        return '.'.join(f'{book_id}-{quantity}' for book_id, quantity in self.lines.items())
+
+    @property
+    def count(self):
+        return len(self.lines)
+
+    def quantity(self, book_id):
+        return self.lines.get(book_id, 0)
+
+    def set(self, book_id, quantity):
+        """Set a line's quantity; returns False if the cart is full"""
+        if quantity <= 0:
+            self.remove(book_id)
+            return True
+        if book_id not in self.lines and len(self.lines) >= self.max_lines():
+            return False
+        self.lines[book_id] = quantity
+        self.modified = True
+        return True
+
+    def remove(self, book_id):
+        if self.lines.pop(book_id, None) is not None:
+            self.modified = True
+
+    def clear(self):
+        if self.lines:
+            self.lines = {}
+            self.modified = True
+
+    def items(self, queryset=None):
+        """CookieCartItems for books that still exist, in the order they were added"""
+        if not self.lines:
+            return []
+        queryset = queryset if queryset is not None else Book.objects.select_related('author')
+        books = queryset.in_bulk(list(self.lines))
+        return [CookieCartItem(books[book_id], quantity) for book_id, quantity in self.lines.items() if book_id in books]
+
+    def save(self, response):
+        if not self.lines:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+            return
+        response.set_signed_cookie(
+            COOKIE_NAME, self.encode(), salt=COOKIE_SALT, max_age=self.max_age(),
+            httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+def get_cookie_cart(request):
+    """The request's CookieCart, decoded once per request"""
+    if not hasattr(request, '_cookie_cart'):
+        request._cookie_cart = CookieCart(request)
+    return request._cookie_cart
+
+
+def materialize_cart(request):
+    """
+    Copy the cookie cart into the session's Cart row so the order code can
+    work from the database. The cookie stays the source of truth until the
+    order succeeds, so the DB lines are replaced rather than merged.
+    """
+    if not request.session.session_key:
+        request.session.create()
+    cart, _ = Cart.objects.get_or_create(session_key=request.session.session_key)
+    lines = get_cookie_cart(request).lines
+    valid = set(Book.objects.filter(id__in=list(lines)).values_list('id', flat=True))
+    with transaction.atomic():
+        cart.items.all().delete()
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, book_id=book_id, quantity=quantity)
+            for book_id, quantity in lines.items() if book_id in valid
+        ])
+    invalidate_cart_count(cart)
+    return cart
+
+
+def merge_cookie_cart(request, user):
+    """
+    Fold an anonymous cookie cart into the user's saved cart at login.
+    A book in both keeps the larger quantity (adding them would double count
+    items re-added before logging in); quantities are capped at stock.
+    """
+    cookie_cart = get_cookie_cart(request)
+    if not cookie_cart.lines:
+        return
+    cart, _ = Cart.objects.get_or_create(user=user)
+    stock = dict(Book.objects.filter(id__in=list(cookie_cart.lines)).values_list('id', 'stock_quantity'))
+    existing = {item.book_id: item for item in cart.items.all()}
+    created, updated = [], []
+    for book_id, quantity in cookie_cart.lines.items():
+        quantity = min(quantity, stock.get(book_id, 0))
+        item = existing.get(book_id)
+        if item is None:
+            if quantity > 0:
+                created.append(CartItem(cart=cart, book_id=book_id, quantity=quantity))
+        elif quantity > item.quantity:
+            item.quantity = quantity
+            updated.append(item)
+    with transaction.atomic():
+        CartItem.objects.bulk_create(created)
+        CartItem.objects.bulk_update(updated, ['quantity'])
+    cookie_cart.clear()
+    invalidate_cart_count(cart)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def autocomplete_cache_check(app_configs, **kwargs):
+    # Each worker keeps its own autocomplete index and learns of catalog
+    # edits made by the others through a version in the default cache
+    if settings.CACHES.get('default', {}).get('BACKEND') not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "The default cache is private to each process, so other workers' "
+        "autocomplete indexes only see catalog edits after "
+        "BOOKSTORE_AUTOCOMPLETE_MAX_AGE seconds.",
+        hint="Set REDIS_URL or CACHE_LOCATION to share the cache between workers.",
+        id='bookstore.W001',
+    )]
@@ -0,0 +1,129 @@
+"""
+Conditional GET for catalog pages.
+
+Each page gets a validator from the newest updated_at among the rows it
+shows, so a revalidating browser or proxy gets a 304 without the view
+rendering anything. Stock changes, counter updates and category edits all
+bump updated_at, which is what keeps these validators honest.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cart import get_cart_item_count
+from .models import Author, Book, Category
+
+
+def _newest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def book_list_modified(request, *args, **kwargs):
+    # The filter dropdowns list every author and category, so deleting
+    # one must change the validator too
+    books = Book.objects.aggregate(latest=Max('updated_at'))
+    authors = Author.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    categories = Category.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    latest = _newest(books['latest'], authors['latest'], categories['latest'])
+    return latest, f"{authors['count']}.{categories['count']}"
+
+
+def book_detail_modified(request, book_id):
+    row = Book.objects.filter(id=book_id).aggregate(
+        book_at=Max('updated_at'), author_at=Max('author__updated_at'), categories_at=Max('categories__updated_at'),
+        # Recommendations only show books in stock, and stock edits bump updated_at
+        recommendations_at=Max('recommendations__computed_at'),
+        recommended_at=Max('recommendations__recommended__updated_at'),
+    )
+    return _newest(*row.values()), ''
+
+
+def author_detail_modified(request, author_id):
+    row = Author.objects.filter(id=author_id).aggregate(
+        author_at=Max('updated_at'), books_at=Max('books__updated_at'),
+    )
+    return _newest(*row.values()), ''
+
+
+def category_detail_modified(request, category_id):
+    row = Category.objects.filter(id=category_id).aggregate(
+        category_at=Max('updated_at'), books_at=Max('books__updated_at'), authors_at=Max('books__author__updated_at'),
+    )
+    return _newest(*row.values()), ''
+
+
+def page_etag(request, last_modified, extra=''):
+    """
+    Validator for one visitor's copy of a page. Besides the data it covers
+    everything per-visitor the layout renders: the user, the cart badge and
+    the CSRF secret behind the form tokens.
+    """
+    parts = [
+        getattr(settings, 'BOOKSTORE_RELEASE', ''),
+        last_modified.isoformat(),
+        extra,
+        str(request.user.pk or ''),
+        str(get_cart_item_count(request)),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def _validate(request, modified_func, args, kwargs):
+    """(etag, last_modified, 304 response or None)"""
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        # Queued messages are shown once, so the page can't come from a cache
+        return None, None, None
+    last_modified, extra = modified_func(request, *args, **kwargs)
+    if last_modified is None:
+        return None, None, None
+    etag = quote_etag(page_etag(request, last_modified, extra))
+    timestamp = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return etag, timestamp, response
+
+
+def _finish(request, response, etag, last_modified):
+    if etag and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    # Anonymous pages differ only by cookie; anything with a user is private
+    visibility = {'private': True} if request.user.is_authenticated else {'public': True}
+    patch_cache_control(
+        response, max_age=getattr(settings, 'BOOKSTORE_PAGE_MAX_AGE', 0), must_revalidate=True, **visibility,
+    )
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def conditional_page(modified_func):
+    """
+    Decorate a sync or async catalog view with ETag / Last-Modified handling.
+    `modified_func(request, *args, **kwargs)` returns (newest updated_at, extra
+    validator text) for the rows behind the page.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified, response = await sync_to_async(_validate)(request, modified_func, args, kwargs)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return await sync_to_async(_finish)(request, response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified, response = _validate(request, modified_func, args, kwargs)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finish(request, response, etag, last_modified)
+        return wrapper
+    return decorator
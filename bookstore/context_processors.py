@@ -0,0 +1,6 @@
+from .cart import get_cart_item_count
+
+
+def cart(request):
+    """Expose the header cart badge count to every template"""
+    return {'cart_item_count': get_cart_item_count(request)}
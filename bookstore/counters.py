@@ -0,0 +1,46 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Now
+
+from .facets import bump_catalog_version
+from .models import Author, Book, Category
+
+
+def adjust_author_count(author_id, delta):
+    if author_id and delta:
+        # Bumping updated_at changes the validators of pages listing the author
+        Author.objects.filter(id=author_id).update(book_count=F('book_count') + delta, updated_at=Now())
+        bump_catalog_version()
+
+
+def adjust_category_counts(category_ids, delta):
+    category_ids = list(category_ids)
+    if category_ids and delta:
+        Category.objects.filter(id__in=category_ids).update(book_count=F('book_count') + delta, updated_at=Now())
+        bump_catalog_version()
+
+
+def recount_books(author_ids=None, category_ids=None):
+    """Recompute denormalized book counts with one UPDATE per table"""
+    author_counts = (
+        Book.objects.filter(author=OuterRef('pk')).order_by()
+        .values('author').annotate(n=Count('id')).values('n')
+    )
+    authors = Author.objects.all()
+    if author_ids is not None:
+        authors = authors.filter(id__in=author_ids)
+    updated_authors = authors.update(
+        book_count=Coalesce(Subquery(author_counts, output_field=IntegerField()), Value(0))
+    )
+
+    category_counts = (
+        Book.categories.through.objects.filter(category=OuterRef('pk')).order_by()
+        .values('category').annotate(n=Count('id')).values('n')
+    )
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+    updated_categories = categories.update(
+        book_count=Coalesce(Subquery(category_counts, output_field=IntegerField()), Value(0))
+    )
+    bump_catalog_version()
+    return updated_authors, updated_categories
@@ -0,0 +1,112 @@
+"""
+Author and category facets for the catalog page.
+
+Each facet is one grouped COUNT over the books matching the other active
+filters, cut to the BOOKSTORE_FACET_SIZE largest values; the rest are
+reached by name through the API's search. Results are cached under the
+normalised filters and a catalog version that counter updates and catalog
+edits bump, so a stale count lasts until the next change at most.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .models import Author, Book, Category
+from .search import get_search_backend, normalize_query
+
+VERSION_KEY = 'facets:version'
+
+BookCategories = Book.categories.through
+
+
+def get_facet_size():
+    return getattr(settings, 'BOOKSTORE_FACET_SIZE', 15)
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Retire every cached facet once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, 1, None)
+    transaction.on_commit(bump)
+
+
+def facet_cache_key(search, category_id, author_id):
+    normalized = '|'.join([normalize_query(search).lower(), category_id or '', author_id or ''])
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f'facets:{catalog_version()}:{digest}'
+
+
+def _selected_first(field, selected_id):
+    # Keeps the chosen value in the list even when it isn't in the top N
+    if not selected_id:
+        return Value(1)
+    return Case(When(**{field: selected_id}, then=Value(0)), default=Value(1), output_field=IntegerField())
+
+
+def category_facet(books, selected_id, filtered):
+    if not filtered:
+        # The counter cache already holds the unfiltered counts
+        rows = Category.objects.filter(book_count__gt=0).order_by(
+            _selected_first('id', selected_id), '-book_count', 'name'
+        ).values_list('id', 'name', 'book_count')
+    else:
+        rows = BookCategories.objects.filter(book__in=books.order_by().values('id')).values(
+            'category_id', 'category__name'
+        ).annotate(count=Count('book_id')).order_by(
+            _selected_first('category_id', selected_id), '-count', 'category__name'
+        ).values_list('category_id', 'category__name', 'count')
+    return [{'id': id, 'name': name, 'count': count} for id, name, count in rows[:get_facet_size()]]
+
+
+def author_facet(books, selected_id, filtered):
+    if not filtered:
+        rows = Author.objects.filter(book_count__gt=0).order_by(
+            _selected_first('id', selected_id), '-book_count', 'name'
+        ).values_list('id', 'name', 'book_count')
+    else:
+        rows = books.order_by().values('author_id', 'author__name').annotate(count=Count('id')).order_by(
+            _selected_first('author_id', selected_id), '-count', 'author__name'
+        ).values_list('author_id', 'author__name', 'count')
+    return [{'id': id, 'name': name, 'count': count} for id, name, count in rows[:get_facet_size()]]
+
+
+def catalog_facets(search='', category_id='', author_id=''):
+    """
+    {'categories': [...], 'authors': [...]}, each entry {'id', 'name', 'count'}.
+    A facet counts the books matching the search and the *other* facet, so
+    choosing a category still shows what each author has in it.
+    """
+    # Ids come straight from the query string
+    category_id = category_id if category_id.isdigit() else ''
+    author_id = author_id if author_id.isdigit() else ''
+    key = facet_cache_key(search, category_id, author_id)
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    books = Book.objects.all()
+    if normalize_query(search):
+        books = get_search_backend().matching(books, search)
+    in_category = books.filter(categories__id=category_id) if category_id else books
+    by_author = books.filter(author_id=author_id) if author_id else books
+    searched = bool(normalize_query(search))
+    facets = {
+        'categories': category_facet(by_author, category_id, searched or bool(author_id)),
+        'authors': author_facet(in_category, author_id, searched or bool(category_id)),
+    }
+    cache.set(key, facets, getattr(settings, 'BOOKSTORE_FACET_TIMEOUT', 60 * 10))
+    return facets
@@ -0,0 +1,114 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.backends.django import DjangoTemplates, Template
+
+_current_metrics = ContextVar('bookstore_request_metrics', default=None)
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """Normalise a statement so repeats with different values compare equal"""
+    return _LITERAL_RE.sub('?', _IN_LIST_RE.sub('IN (...)', sql))
+
+
+class QueryCounter:
+    """
+    Count the queries issued on one connection inside a `with` block.
+    Uses an execute wrapper, so it works without DEBUG.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+class RequestMetrics:
+    """Queries, DB time and template time collected while serving one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold=3):
+        """Statements repeated `threshold` or more times, most frequent first"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    def activate(self):
+        return _current_metrics.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_metrics.reset(token)
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper that reports to whichever request is active in this context"""
+    metrics = current_metrics()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver. Installing the wrapper on every connection,
+    rather than per request, also covers queries that async views run on the
+    sync_to_async worker thread's connection.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the request metrics"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import Book, Order, OrderItem, StockReservation
+
+
+class InsufficientStock(Exception):
+    """Raised when an order asks for more copies than are in stock"""
+
+    def __init__(self, books):
+        self.books = books
+        titles = ', '.join(book.title for book in books)
+        super().__init__(f"Not enough stock for: {titles}")
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'BOOKSTORE_RESERVATION_TTL', 30 * 60))
+
+
+def _order_lines(order):
+    lines = {}
+    for book_id, quantity in OrderItem.objects.filter(order=order).values_list('book_id', 'quantity'):
+        lines[book_id] = lines.get(book_id, 0) + quantity
+    return lines
+
+
+def _stock_delta(deltas):
+    return Case(
+        *[When(id=book_id, then=F('stock_quantity') + delta) for book_id, delta in deltas.items()],
+        default=F('stock_quantity'),
+        output_field=IntegerField(),
+    )
+
+
+def take_stock(lines):
+    """
+    Decrement stock for {book_id: quantity} in one conditional UPDATE.
+    Raises InsufficientStock, leaving stock untouched, unless every book
+    had enough copies. Must run inside a transaction.
+    """
+    if not lines:
+        return
+    available = Q()
+    for book_id, quantity in lines.items():
+        available |= Q(id=book_id, stock_quantity__gte=quantity)
+    updated = Book.objects.filter(available).update(
+        stock_quantity=_stock_delta({book_id: -quantity for book_id, quantity in lines.items()}),
+        updated_at=Now(),
+    )
+    if updated != len(lines):
+        short = [
+            book for book in Book.objects.filter(id__in=lines)
+            if book.stock_quantity < lines[book.id]
+        ]
+        raise InsufficientStock(short)
+
+
+def return_stock(lines):
+    """Add {book_id: quantity} back to stock in one UPDATE"""
+    if lines:
+        Book.objects.filter(id__in=lines).update(stock_quantity=_stock_delta(lines), updated_at=Now())
+
+
+def reserve_stock(order, lines=None):
+    """Hold stock for every line of `order` until it is committed or expires"""
+    if lines is None:
+        lines = _order_lines(order)
+    expires_at = timezone.now() + reservation_ttl()
+    with transaction.atomic():
+        take_stock(lines)
+        StockReservation.objects.bulk_create([
+            StockReservation(order=order, book_id=book_id, quantity=quantity, expires_at=expires_at)
+            for book_id, quantity in lines.items()
+        ])
+
+
+def commit_order_stock(order):
+    """
+    Turn the order's reservations into a permanent sale, exactly once.
+    Returns False when the order was already committed. Lines whose
+    reservations expired in the meantime have their stock taken again,
+    which may raise InsufficientStock.
+    """
+    with transaction.atomic():
+        claimed = Order.objects.filter(id=order.id, stock_committed=False).update(stock_committed=True)
+        if not claimed:
+            return False
+        # The claim holds the write lock, so no expiry can run in between
+        reservations = StockReservation.objects.filter(order=order)
+        reserved = dict(reservations.values_list('book_id', 'quantity'))
+        reservations.delete()
+        take_stock({
+            book_id: quantity - reserved.get(book_id, 0)
+            for book_id, quantity in _order_lines(order).items()
+            if quantity > reserved.get(book_id, 0)
+        })
+    order.stock_committed = True
+    return True
+
+
+def release_order_stock(order_ids):
+    """Give back stock held by uncommitted orders; returns reservations released"""
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order_id__in=order_ids, order__stock_committed=False)
+            .values_list('id', 'book_id', 'quantity')
+        )
+        return _release(reservations)
+
+
+def release_expired_reservations(now=None, batch_size=1000):
+    """Return stock from expired reservations in bounded batches"""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            reservations = list(
+                StockReservation.objects.select_for_update()
+                .filter(expires_at__lte=now)
+                .values_list('id', 'book_id', 'quantity')[:batch_size]
+            )
+            released = _release(reservations)
+        total += released
+        if released < batch_size:
+            return total
+
+
+def _release(reservations):
+    lines = {}
+    for _, book_id, quantity in reservations:
+        lines[book_id] = lines.get(book_id, 0) + quantity
+    return_stock(lines)
+    StockReservation.objects.filter(id__in=[row[0] for row in reservations]).delete()
+    return len(reservations)
@@ -0,0 +1,285 @@
+import json
+import logging
+import random
+import time
+from decimal import Decimal
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from bookstore.counters import recount_books
+from bookstore.instrumentation import QueryCounter
+from bookstore.models import Author, Book, Cart, CartItem, Category, Order, OrderItem
+from bookstore.orders import place_order
+from bookstore.search import get_search_backend
+
+BookCategories = Book.categories.through
+
+CUSTOMER = {
+    'email': 'bench@example.com',
+    'first_name': 'Bench',
+    'last_name': 'Mark',
+    'phone': '9000000000',
+    'address': '1 Load Test Lane',
+    'city': 'Chennai',
+    'postal_code': '600001',
+    'country': 'India',
+}
+
+WORDS = (
+    'shadow river garden empire silent winter golden night secret ocean city stone '
+    'fire glass paper moon forest storm iron letter house road star wind'
+).split()
+
+# Isolated cache so a benchmark never reads or clears the shared production cache
+BENCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bookstore-bench'}}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and benchmark every bookstore URL through the test client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='Fail if results regress against this JSON file')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed p95 slowdown against the baseline, as a fraction',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        baseline = self.load_baseline(options['baseline'])
+
+        # One log line per timed request would drown the report
+        logging.getLogger('bookstore.requests').setLevel(logging.WARNING)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # The cart scenarios address lines by CartItem id. Only the default
+            # alias points at the throwaway database, so no reads are routed away
+            with override_settings(CACHES=BENCH_CACHES, BOOKSTORE_CART_BACKEND='database', DATABASE_ROUTERS=[]):
+                self.seed()
+                results = self.run_scenarios()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'django': django.get_version(),
+            'created_at': timezone.now().isoformat(),
+            'dataset': {key: options[key] for key in ('authors', 'categories', 'books', 'carts', 'orders')},
+            'requests_per_view': options['requests'],
+            'views': results,
+        }
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline:
+            self.compare(baseline, results)
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)['views']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+
+    # Dataset
+
+    def seed(self):
+        opts = self.options
+        started = time.monotonic()
+        rnd = self.random
+
+        Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(opts['categories'])])
+        Author.objects.bulk_create([
+            Author(name=f'{rnd.choice(WORDS).title()} Author {i}', bio='Synthetic author.')
+            for i in range(opts['authors'])
+        ])
+        author_ids = list(Author.objects.values_list('id', flat=True))
+        category_ids = list(Category.objects.values_list('id', flat=True))
+
+        batch = 2000
+        for start in range(0, opts['books'], batch):
+            books = Book.objects.bulk_create([
+                Book(
+                    title=' '.join(rnd.choice(WORDS).title() for _ in range(3)) + f' {i}',
+                    author_id=rnd.choice(author_ids),
+                    isbn=f'{9780000000000 + i}',
+                    price=Decimal(rnd.randint(99, 2999)) / 100,
+                    stock_quantity=1000000,
+                )
+                for i in range(start, min(start + batch, opts['books']))
+            ])
+            BookCategories.objects.bulk_create([
+                BookCategories(book_id=book.id, category_id=category_id)
+                for book in books
+                for category_id in rnd.sample(category_ids, min(2, len(category_ids)))
+            ])
+        self.book_ids = list(Book.objects.values_list('id', flat=True))
+
+        for i in range(opts['carts']):
+            cart = Cart.objects.create(session_key=f'bench-cart-{i}')
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, book_id=book_id, quantity=rnd.randint(1, 3))
+                for book_id in rnd.sample(self.book_ids, min(3, len(self.book_ids)))
+            ])
+
+        prices = dict(Book.objects.values_list('id', 'price'))
+        for start in range(0, opts['orders'], batch):
+            orders = Order.objects.bulk_create([
+                Order(total_amount=0, stock_committed=True, status=rnd.choice(Order.STATUS_CHOICES)[0], **CUSTOMER)
+                for _ in range(start, min(start + batch, opts['orders']))
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, book_id=book_id, quantity=1, price=prices[book_id])
+                for order in orders
+                for book_id in rnd.sample(self.book_ids, min(3, len(self.book_ids)))
+            ])
+
+        # bulk_create skips the signals that maintain these
+        recount_books()
+        get_search_backend().rebuild()
+        self.stdout.write(f"Seeded dataset in {time.monotonic() - started:.1f}s")
+
+    # Scenarios
+
+    def scenarios(self):
+        book = Book.objects.select_related('author').get(id=self.random.choice(self.book_ids))
+        category_id = book.categories.values_list('id', flat=True).first()
+        search = book.title.split()[0]
+        first_page = self.client.get(reverse('book_list'), {'format': 'json'}).json()
+        order = Order.objects.order_by('id').first()
+
+        def get(name, *args, **query):
+            return lambda: ('get', reverse(name, args=args), query)
+
+        def add_to_cart():
+            return 'post', reverse('add_to_cart', args=[self.random.choice(self.book_ids)]), {}
+
+        def cart_item():
+            cart = Cart.objects.get(session_key=self.client.session.session_key)
+            item, _ = CartItem.objects.get_or_create(cart=cart, book_id=self.random.choice(self.book_ids))
+            return item
+
+        def update_cart():
+            return 'post', reverse('update_cart', args=[cart_item().id]), {'quantity': 2}
+
+        def remove_from_cart():
+            return 'post', reverse('remove_from_cart', args=[cart_item().id]), {}
+
+        def place():
+            cart = Cart.objects.get(session_key=self.client.session.session_key)
+            cart_item()
+            return place_order(cart, CUSTOMER).order
+
+        def payment():
+            return 'get', reverse('payment', args=[place().id]), {}
+
+        def order_success():
+            return 'get', reverse('order_success', args=[place().id]), {}
+
+        def checkout_post():
+            cart_item()
+            return 'post', reverse('checkout'), CUSTOMER
+
+        return [
+            ('book_list', get('book_list')),
+            ('book_list?search', get('book_list', search=search)),
+            ('book_list?category', get('book_list', category=category_id)),
+            ('book_list?author', get('book_list', author=book.author_id)),
+            ('book_list?cursor', get('book_list', cursor=first_page['next'] or '')),
+            ('book_list?format=json', get('book_list', format='json')),
+            ('book_detail', get('book_detail', book.id)),
+            ('author_list', get('author_list')),
+            ('author_detail', get('author_detail', book.author_id)),
+            ('category_list', get('category_list')),
+            ('category_detail', get('category_detail', category_id)),
+            ('add_to_cart', add_to_cart),
+            ('view_cart', get('view_cart')),
+            ('update_cart', update_cart),
+            ('remove_from_cart', remove_from_cart),
+            ('checkout', get('checkout')),
+            ('checkout[POST]', checkout_post),
+            ('payment', payment),
+            ('order_success', order_success),
+            ('track_order', get('track_order')),
+            ('track_order[POST]', lambda: ('post', reverse('track_order'), {'order_id': order.id, 'email': order.email})),
+        ]
+
+    def run_scenarios(self):
+        self.client = Client()
+        # Give the client a session and a cart before any timed request
+        self.client.post(reverse('add_to_cart', args=[self.book_ids[0]]))
+        results = {}
+        for name, prepare in self.scenarios():
+            timings, queries, sizes, statuses = [], [], [], set()
+            for _ in range(self.options['requests']):
+                method, path, data = prepare()
+                with QueryCounter() as counter:
+                    started = time.perf_counter()
+                    response = getattr(self.client, method)(path, data)
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    elapsed = time.perf_counter() - started
+                timings.append(elapsed * 1000)
+                queries.append(counter.count)
+                sizes.append(len(body))
+                statuses.add(response.status_code)
+            results[name] = {
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'mean_ms': round(sum(timings) / len(timings), 3),
+                'queries': max(queries),
+                'bytes': max(sizes),
+                'status': sorted(statuses),
+            }
+        return results
+
+    # Reporting
+
+    def print_table(self, results):
+        self.stdout.write(f"{'view':<24}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'bytes':>10}  status")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<24}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['queries']:>9}"
+                f"{row['bytes']:>10}  {','.join(map(str, row['status']))}"
+            )
+
+    def compare(self, baseline, results):
+        tolerance = self.options['tolerance']
+        regressions = []
+        for name, before in baseline.items():
+            after = results.get(name)
+            if after is None:
+                continue
+            # 1ms of slack keeps sub-millisecond views from flapping
+            if after['p95_ms'] > before['p95_ms'] * (1 + tolerance) + 1:
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {after['p95_ms']:.2f}ms")
+            if after['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {after['queries']}")
+        if regressions:
+            raise CommandError('Benchmark regressed against baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
@@ -0,0 +1,164 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookstore.models import Author, Book, Category
+
+from .bench import percentile
+
+SERVERS = {
+    'wsgi': [
+        sys.executable, '-m', 'gunicorn', 'online_bookstore.wsgi:application',
+        '--bind', '127.0.0.1:{port}', '--workers', '{workers}', '--log-level', 'warning',
+    ],
+    'asgi': [
+        sys.executable, '-m', 'uvicorn', 'online_bookstore.asgi:application',
+        '--host', '127.0.0.1', '--port', '{port}', '--workers', '{workers}', '--log-level', 'warning',
+    ],
+}
+# The sync catalog views under uvicorn, to separate server from view overhead
+SERVERS['asgi-sync'] = SERVERS['asgi']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the project under gunicorn (WSGI) and uvicorn (ASGI) against the '
+        'configured database and compare requests per second on the catalog views'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=['wsgi', 'asgi'])
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per URL')
+        parser.add_argument('--path', action='append', dest='paths', help='URL to load; repeatable')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        self.options = options
+        paths = options['paths'] or self.default_paths()
+        results = {}
+        for server in options['servers']:
+            self.stdout.write(f"Benchmarking {server} with {options['workers']} workers...")
+            results[server] = self.bench_server(server, paths)
+
+        self.print_table(results, paths)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {k: options[k] for k in ('workers', 'concurrency', 'duration')},
+                           'servers': results}, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def default_paths(self):
+        paths = ['/', '/?search=the', '/authors/', '/categories/', '/track-order/']
+        book = Book.objects.order_by('id').values('id', 'author_id').first()
+        category_id = Category.objects.filter(book_count__gt=0).values_list('id', flat=True).first()
+        if book:
+            paths += [f"/book/{book['id']}/", f"/author/{book['author_id']}/"]
+        if category_id:
+            paths.append(f'/category/{category_id}/')
+        if not Author.objects.exists():
+            self.stderr.write('The database has no catalog; seed it first (e.g. with import_catalog)')
+        return paths
+
+    def bench_server(self, server, paths):
+        port = free_port()
+        command = [part.format(port=port, workers=self.options['workers']) for part in SERVERS[server]]
+        env = dict(os.environ, BOOKSTORE_LOG_LEVEL='WARNING')
+        # Each deployment gets the views it would run in production
+        env['BOOKSTORE_ASYNC_VIEWS'] = '1' if server == 'asgi' else '0'
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            self.wait_until_ready(port, process)
+            return {path: self.load(port, path) for path in paths}
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def wait_until_ready(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with status {process.returncode}; is it installed?")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/categories/')
+                conn.getresponse().read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Server did not start listening on port {port}")
+
+    def load(self, port, path):
+        """Hit `path` from --concurrency keep-alive connections for --duration seconds"""
+        timings, errors = [], [0]
+        lock = threading.Lock()
+        stop_at = time.monotonic() + self.options['duration']
+
+        def client():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            local, failed = [], 0
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path)
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status >= 400:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    continue
+                local.append((time.perf_counter() - started) * 1000)
+            conn.close()
+            with lock:
+                timings.extend(local)
+                errors[0] += failed
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client) for _ in range(self.options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        return {
+            'requests': len(timings),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 2) if timings else None,
+            'p95_ms': round(percentile(timings, 95), 2) if timings else None,
+            'errors': errors[0],
+        }
+
+    def print_table(self, results, paths):
+        servers = list(results)
+        header = f"{'path':<28}" + ''.join(f"{server + ' rps':>12}{'p95 ms':>9}" for server in servers)
+        if servers == ['wsgi', 'asgi']:
+            header += f"{'asgi/wsgi':>11}"
+        self.stdout.write(header)
+        for path in paths:
+            line = f"{path:<28}"
+            for server in servers:
+                row = results[server][path]
+                line += f"{row['rps']:>12.1f}{row['p95_ms'] or 0:>9.1f}"
+                if row['errors']:
+                    line += f" ({row['errors']} errors)"
+            if servers == ['wsgi', 'asgi'] and results['wsgi'][path]['rps']:
+                line += f"{results['asgi'][path]['rps'] / results['wsgi'][path]['rps']:>10.2f}x"
+            self.stdout.write(line)
@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookstore import autocomplete
+from bookstore.counters import recount_books
+from bookstore.models import Author, Book, Category
+from bookstore.search import get_search_backend
+
+BookCategories = Book.categories.through
+PRICE_FIELD = Book._meta.get_field('price')
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL catalog file into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV/JSONL file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--category-separator', default='|',
+            help='Separator for the categories column in CSV files',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        self.separator = options['category_separator']
+        self.authors = {}
+        self.categories = {}
+        self.imported = self.skipped = self.invalid = 0
+        self.started = time.monotonic()
+
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            try:
+                stream = open(path, encoding='utf-8', newline='')
+            except OSError as e:
+                raise CommandError(f"Cannot open {path}: {e}")
+
+        with stream:
+            rows = csv.DictReader(stream) if fmt == 'csv' else self.jsonl_rows(stream)
+            batch = []
+            for row in rows:
+                book = self.parse_row(row)
+                if book is None:
+                    self.invalid += 1
+                    continue
+                batch.append(book)
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} books, skipped {self.skipped} duplicates and "
+            f"{self.invalid} invalid rows ({self.rate():.0f} rows/s)"
+        ))
+
+    def jsonl_rows(self, stream):
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                self.warn(f"Line {number}: invalid JSON")
+                row = {}
+            if not isinstance(row, dict):
+                self.warn(f"Line {number}: not a JSON object")
+                row = {}
+            yield row
+
+    def parse_row(self, row):
+        # JSONL values can be numbers, lists or objects as well as strings
+        title = str(row.get('title') or '').strip()
+        author = str(row.get('author') or '').strip()
+        isbn = str(row.get('isbn') or '').replace('-', '').strip()
+        if not (title and author and isbn) or len(isbn) > 13:
+            self.warn(f"Skipping row without a valid title, author and ISBN: {row!r}")
+            return None
+        try:
+            price = Decimal(str(row.get('price') or '0'))
+            # NaN, infinity and prices the column cannot hold would fail the whole batch
+            PRICE_FIELD.run_validators(price)
+            stock = int(str(row.get('stock_quantity') or 0))
+            published = row.get('publication_date') or None
+            if published:
+                published = date.fromisoformat(str(published))
+        except (InvalidOperation, ValueError, ValidationError):
+            self.warn(f"Skipping row with a bad price, stock or date: {row!r}")
+            return None
+
+        categories = row.get('categories') or []
+        if not isinstance(categories, list):
+            categories = str(categories).split(self.separator)
+        categories = [str(name).strip()[:100] for name in categories]
+        return {
+            'title': title[:300],
+            'author': author[:200],
+            'author_bio': str(row.get('author_bio') or ''),
+            'isbn': isbn,
+            'price': price,
+            'stock_quantity': max(stock, 0),
+            'publication_date': published,
+            'categories': [name for name in categories if name],
+        }
+
+    def import_batch(self, rows):
+        # Drop ISBNs repeated within the batch or already in the database
+        unique = {}
+        for row in rows:
+            unique.setdefault(row['isbn'], row)
+        existing = set(Book.objects.filter(isbn__in=unique).values_list('isbn', flat=True))
+        fresh = [row for isbn, row in unique.items() if isbn not in existing]
+        self.skipped += len(rows) - len(fresh)
+        rows = fresh
+        if not rows:
+            self.report()
+            return
+
+        with transaction.atomic():
+            self.resolve_authors(rows)
+            self.resolve_categories(rows)
+            books = Book.objects.bulk_create([
+                Book(
+                    title=row['title'],
+                    author_id=self.authors[row['author']],
+                    isbn=row['isbn'],
+                    price=row['price'],
+                    stock_quantity=row['stock_quantity'],
+                    publication_date=row['publication_date'],
+                )
+                for row in rows
+            ])
+            links = {
+                (book.id, self.categories[name])
+                for book, row in zip(books, rows)
+                for name in row['categories']
+            }
+            BookCategories.objects.bulk_create(
+                [BookCategories(book_id=book_id, category_id=category_id) for book_id, category_id in links],
+                batch_size=self.batch_size,
+            )
+            # bulk_create bypasses the signals that maintain these
+            recount_books(
+                author_ids={self.authors[row['author']] for row in rows},
+                category_ids={category_id for _, category_id in links},
+            )
+            get_search_backend().index_books([book.id for book in books])
+            # Serving workers rebuild, which picks up the new authors too
+            autocomplete.update_on_commit('book', [book.id for book in books])
+
+        self.imported += len(books)
+        self.report()
+
+    def resolve_authors(self, rows):
+        missing = {row['author']: row['author_bio'] for row in rows if row['author'] not in self.authors}
+        if not missing:
+            return
+        for author_id, name in Author.objects.filter(name__in=missing).values_list('id', 'name'):
+            self.authors.setdefault(name, author_id)
+        new = [Author(name=name, bio=bio) for name, bio in missing.items() if name not in self.authors]
+        for author in Author.objects.bulk_create(new):
+            self.authors[author.name] = author.id
+
+    def resolve_categories(self, rows):
+        missing = {name for row in rows for name in row['categories'] if name not in self.categories}
+        if not missing:
+            return
+        for category_id, name in Category.objects.filter(name__in=missing).values_list('id', 'name'):
+            self.categories[name] = category_id
+        new = [Category(name=name) for name in missing if name not in self.categories]
+        for category in Category.objects.bulk_create(new):
+            self.categories[category.name] = category.id
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return (self.imported + self.skipped + self.invalid) / elapsed if elapsed else 0
+
+    def report(self):
+        if self.verbosity >= 1:
+            self.stdout.write(
+                f"  {self.imported} imported, {self.skipped} duplicates, "
+                f"{self.invalid} invalid ({self.rate():.0f} rows/s)"
+            )
+
+    def warn(self, message):
+        if self.verbosity >= 2:
+            self.stderr.write(message)
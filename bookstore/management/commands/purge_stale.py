@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookstore.inventory import release_order_stock
+from bookstore.models import Cart, Order
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned anonymous carts, expired sessions and unpaid pending orders in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cart-days', type=int, default=30, help='Anonymous carts untouched for this long')
+        parser.add_argument('--session-days', type=int, default=0, help='Sessions expired for this long')
+        parser.add_argument('--order-days', type=int, default=7, help='Unpaid pending orders older than this')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Rows per delete; each batch is its own short transaction',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        now = timezone.now()
+
+        cart_cutoff = now - timedelta(days=options['cart_days'])
+        order_cutoff = now - timedelta(days=options['order_days'])
+        targets = [
+            # Carts of anonymous visitors with no recent activity
+            ('carts', Cart.objects.filter(user__isnull=True, updated_at__lt=cart_cutoff)
+                .exclude(items__added_at__gte=cart_cutoff), None),
+            # Checkouts that never reached payment; their reserved stock goes back first
+            ('pending orders', Order.objects.filter(status='pending', stock_committed=False, created_at__lt=order_cutoff),
+                release_order_stock),
+            ('sessions', Session.objects.filter(expire_date__lt=now - timedelta(days=options['session_days'])), None),
+        ]
+
+        started = time.monotonic()
+        total = 0
+        for label, queryset, before_delete in targets:
+            total += self.purge(label, queryset, before_delete)
+        elapsed = time.monotonic() - started
+
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
+
+    def purge(self, label, queryset, before_delete=None):
+        """Delete `queryset` batch by batch; returns rows deleted, cascades included"""
+        pk = queryset.model._meta.pk.name
+        if self.dry_run:
+            count = queryset.count()
+            self.stdout.write(f"  {label}: {count} would be deleted, plus their dependent rows")
+            return count
+
+        started = time.monotonic()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.order_by(pk).values_list(pk, flat=True)[:self.batch_size])
+                if not ids:
+                    break
+                if before_delete:
+                    before_delete(ids)
+                # Re-apply the filter so rows that changed since the SELECT survive
+                count, _ = queryset.filter(**{f'{pk}__in': ids}).delete()
+            deleted += count
+            if len(ids) < self.batch_size:
+                break
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"  {label}: {deleted} rows deleted ({deleted / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+        return deleted
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookstore.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recount book pairs from recorded orders and recompute every book\'s "customers also bought" list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Books per batch')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        processed = 0
+        for processed in rebuild_recommendations(batch_size=options['batch_size']):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  {processed} books processed")
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt recommendations for {processed} books in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookstore.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the catalog full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.monotonic()
+        total = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} books with {backend.__class__.__name__} in {elapsed:.2f}s"
+        ))
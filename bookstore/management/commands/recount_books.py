@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from bookstore.counters import recount_books
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized author and category book counts'
+
+    def handle(self, *args, **options):
+        authors, categories = recount_books()
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted books for {authors} authors and {categories} categories"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from bookstore.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Return stock held by expired checkout reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservations"))
@@ -0,0 +1,168 @@
+"""
+Delivery of uploaded media (covers, author photos, thumbnails) when DEBUG
+is off.
+
+BOOKSTORE_MEDIA_DELIVERY picks how:
+
+- 'x-accel-redirect': nginx sends the file from an internal location
+  mapped to MEDIA_ROOT at BOOKSTORE_MEDIA_ACCEL_PREFIX
+- 'x-sendfile': Apache (mod_xsendfile) or lighttpd sends the file
+- 'django' (default): served here with FileResponse, which lets the WSGI
+  server use sendfile(), plus ETag/Last-Modified revalidation and single
+  byte ranges
+
+Names matching BOOKSTORE_MEDIA_IMMUTABLE_PATTERN embed a content hash and
+are cached for a year as immutable; everything else for
+BOOKSTORE_MEDIA_MAX_AGE seconds.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from .streaming import streaming_response
+
+ONE_YEAR = 60 * 60 * 24 * 365
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_path(path):
+    """Absolute path of `path` inside MEDIA_ROOT; Http404 for anything outside it"""
+    try:
+        return safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+
+
+def is_immutable(path):
+    pattern = getattr(settings, 'BOOKSTORE_MEDIA_IMMUTABLE_PATTERN', r'\.[0-9a-f]{12}\.\w+$')
+    return bool(pattern and re.search(pattern, path))
+
+
+def set_cache_headers(response, path):
+    if is_immutable(path):
+        patch_cache_control(response, public=True, max_age=ONE_YEAR, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'BOOKSTORE_MEDIA_MAX_AGE', 60 * 60 * 24))
+    return response
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to send the
+    whole file, or False when the range can't be satisfied
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: the full response is always valid
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def offload(path):
+    """Response telling the front server to send the file itself"""
+    mode = getattr(settings, 'BOOKSTORE_MEDIA_DELIVERY', 'django')
+    content_type, _ = mimetypes.guess_type(path)
+    response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'BOOKSTORE_MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(path)
+    else:
+        response['X-Sendfile'] = media_path(path)
+    return set_cache_headers(response, path)
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT, or hand it to the front server"""
+    full_path = media_path(path)
+    if getattr(settings, 'BOOKSTORE_MEDIA_DELIVERY', 'django') in ('x-accel-redirect', 'x-sendfile'):
+        return offload(path)
+
+    try:
+        info = os.stat(full_path)
+    except OSError:
+        raise Http404('Media file not found')
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404('Media file not found')
+
+    # Same shape as nginx's ETag, so switching delivery modes keeps caches warm
+    etag = quote_etag(f'{int(info.st_mtime):x}-{info.st_size:x}')
+    last_modified = int(info.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, full_path, info.st_size, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if response.status_code == 416:
+        return response
+    return set_cache_headers(response, path)
+
+
+def _file_response(request, full_path, size, etag, last_modified):
+    requested = request.headers.get('Range')
+    if requested and _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(requested, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            content_type, _ = mimetypes.guess_type(full_path)
+            # Chunks are already CHUNK_SIZE, so ASGI gets them one at a time
+            response = streaming_response(
+                request, _read_range(full_path, start, end - start + 1), batch_size=1,
+                status=206, content_type=content_type or 'application/octet-stream',
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return response
+    # Whole file: FileResponse lets the server use wsgi.file_wrapper/sendfile
+    return FileResponse(open(full_path, 'rb'))
+
+
+def _if_range_matches(request, etag, last_modified):
+    """A Range only applies if If-Range, when sent, still names this version"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
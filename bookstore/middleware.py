@@ -0,0 +1,129 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .instrumentation import RequestMetrics
+
+logger = logging.getLogger('bookstore.requests')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view issued more queries than its configured budget"""
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Record SQL count, DB time, template time and repeated statements for
+    every request. Emits a Server-Timing header and one JSON log line, and
+    enforces BOOKSTORE_QUERY_BUDGETS (raise when strict, warn otherwise).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            RequestMetrics.deactivate(token)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            RequestMetrics.deactivate(token)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    def report(self, request, response, metrics, total):
+        match = request.resolver_match
+        view = match.view_name if match else None
+        threshold = getattr(settings, 'BOOKSTORE_DUPLICATE_QUERY_THRESHOLD', 3)
+        duplicates = metrics.duplicates(threshold)
+
+        if getattr(settings, 'BOOKSTORE_SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates],
+        }))
+
+        budget = getattr(settings, 'BOOKSTORE_QUERY_BUDGETS', {}).get(view)
+        if budget is not None and metrics.queries > budget:
+            message = f"{view} ran {metrics.queries} queries, over its budget of {budget}"
+            if duplicates:
+                message += '; repeated: ' + '; '.join(f'{count}x {sql}' for sql, count in duplicates)
+            if getattr(settings, 'BOOKSTORE_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also sit in an async middleware chain. Stock
+    WhiteNoiseMiddleware is sync-only, which under ASGI would push every
+    request, static or not, through a worker thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class CookieCartMiddleware(MiddlewareMixin):
+    """Write the signed cart cookie back when a view changed the cookie cart"""
+
+    def process_response(self, request, response):
+        cart = getattr(request, '_cookie_cart', None)
+        if cart is not None and cart.modified:
+            cart.save(response)
+        return response
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_fts_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS bookstore_book_fts USING fts5("
+            "title, author, isbn, categories, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            "INSERT INTO bookstore_book_fts (rowid, title, author, isbn, categories) "
+            "SELECT b.id, b.title, a.name, b.isbn, "
+            "COALESCE((SELECT group_concat(c.name, ' ') FROM bookstore_book_categories bc "
+            "JOIN bookstore_category c ON c.id = bc.category_id WHERE bc.book_id = b.id), '') "
+            "FROM bookstore_book b JOIN bookstore_author a ON a.id = b.author_id"
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS bookstore_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookstore', '0004_order_orderitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:20
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_book_counts(apps, schema_editor):
+    Author = apps.get_model('bookstore', 'Author')
+    Book = apps.get_model('bookstore', 'Book')
+    Category = apps.get_model('bookstore', 'Category')
+    author_counts = (
+        Book.objects.filter(author=OuterRef('pk')).order_by()
+        .values('author').annotate(n=Count('id')).values('n')
+    )
+    Author.objects.update(book_count=Coalesce(Subquery(author_counts, output_field=IntegerField()), Value(0)))
+    category_counts = (
+        Book.categories.through.objects.filter(category=OuterRef('pk')).order_by()
+        .values('category').annotate(n=Count('id')).values('n')
+    )
+    Category.objects.update(book_count=Coalesce(Subquery(category_counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookstore', '0006_book_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_book_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def commit_existing_orders(apps, schema_editor):
+    # Orders placed before reservations took their stock at checkout
+    Order = apps.get_model('bookstore', 'Order')
+    Order.objects.update(stock_committed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookstore', '0007_author_category_book_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_committed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bookstore.book')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='bookstore.order')),
+            ],
+            options={
+                'unique_together': {('order', 'book')},
+            },
+        ),
+        migrations.RunPython(commit_existing_orders, migrations.RunPython.noop),
+    ]
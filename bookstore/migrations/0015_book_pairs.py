@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Pairs of the orders already recorded as sales, as rebuild_recommendations counts them
+COUNT_PAIRS = """
+INSERT INTO bookstore_bookpair (book_id, other_id, orders)
+SELECT line.book_id, other.book_id, COUNT(*)
+FROM bookstore_orderitem line
+JOIN bookstore_orderitem other ON other.order_id = line.order_id AND other.book_id <> line.book_id
+JOIN bookstore_order ON bookstore_order.id = line.order_id
+WHERE bookstore_order.sales_recorded
+GROUP BY line.book_id, other.book_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookstore', '0014_book_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookstore.book')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookstore.book')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('book', 'other'), name='bookpair_book_other_uniq')],
+            },
+        ),
+        migrations.RunSQL(COUNT_PAIRS, migrations.RunSQL.noop),
+    ]
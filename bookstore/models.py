@@ -1,23 +1,36 @@
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
+
+from .thumbnails import thumbnail_url
 
 class Author(models.Model):
     name = models.CharField(max_length=200)
     bio = models.TextField()
     photo = models.ImageField(upload_to='authors/', blank=True, null=True)  
+    book_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.name
+
+    @property
+    def photo_thumbnail(self):
+        return thumbnail_url(self.photo, 'avatar')
+
+    @property
+    def photo_thumbnail_small(self):
+        return thumbnail_url(self.photo, 'small')
     
     class Meta:
         ordering = ['name']
+        indexes = [models.Index(fields=['name', 'id'], name='author_name_id_idx')]
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.name
@@ -43,13 +56,26 @@ class Book(models.Model):
     publication_date = models.DateField(blank=True, null=True)
     stock_quantity = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.title
+
+    @property
+    def cover_thumbnail(self):
+        return thumbnail_url(self.cover_image, 'card')
+
+    @property
+    def cover_thumbnail_small(self):
+        return thumbnail_url(self.cover_image, 'small')
     
     class Meta:
         ordering = ['title']
+        indexes = [
+            # Keyset pagination on (title, id), globally and per author
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            models.Index(fields=['author', 'title', 'id'], name='book_author_title_id_idx'),
+        ]
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -60,9 +86,16 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart {self.id}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['session_key'], name='cart_session_key_idx'),
+            # purge_stale scans anonymous carts by last activity
+            models.Index(fields=['user', 'updated_at'], name='cart_user_updated_idx'),
+        ]
+
     @property
     def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+        return sum(item.subtotal for item in self.items.select_related('book'))
 
     @property
     def total_items(self):
@@ -106,6 +139,8 @@ class Order(models.Model):
     country = models.CharField(max_length=100, default='India')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    stock_committed = models.BooleanField(default=False)
+    sales_recorded = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -114,6 +149,11 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the staff dashboard, optionally by status
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_id_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
@@ -130,3 +170,102 @@ class OrderItem(models.Model):
     
     class Meta:
         unique_together = ['order', 'book']
+
+
+class StockReservation(models.Model):
+    """Stock held for an order between checkout and payment"""
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.book_id} for order #{self.order_id}"
+
+    class Meta:
+        unique_together = ['order', 'book']
+
+
+class BookPair(models.Model):
+    """
+    Number of confirmed orders holding both `book` and `other`, stored in
+    both directions. Kept by bookstore.recommendations; rebuild with
+    rebuild_recommendations.
+    """
+    book = models.ForeignKey(Book, related_name='+', on_delete=models.CASCADE)
+    other = models.ForeignKey(Book, related_name='+', on_delete=models.CASCADE)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'other'], name='bookpair_book_other_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} + {self.other_id} ({self.orders} orders)"
+
+
+class BookRecommendation(models.Model):
+    """
+    A book often bought together with `book`: one of its top BookPair rows,
+    by number of confirmed orders holding both. Kept by
+    bookstore.recommendations.
+    """
+    book = models.ForeignKey(Book, related_name='recommendations', on_delete=models.CASCADE)
+    recommended = models.ForeignKey(Book, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    orders = models.PositiveIntegerField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='recommendation_book_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_id} ({self.orders} orders)"
+
+
+# ====== SALES ROLLUPS ======
+# Maintained incrementally by bookstore.sales; rebuild with rebuild_sales_rollups
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = "Daily sales"
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+
+class BookSales(models.Model):
+    book = models.OneToOneField(Book, related_name='sales', on_delete=models.CASCADE)
+    units = models.IntegerField(default=0, db_index=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-units']
+        verbose_name_plural = "Book sales"
+
+    def __str__(self):
+        return f"{self.book_id}: {self.units} units"
+
+
+class CategorySales(models.Model):
+    category = models.OneToOneField(Category, related_name='sales', on_delete=models.CASCADE)
+    units = models.IntegerField(default=0, db_index=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-units']
+        verbose_name_plural = "Category sales"
+
+    def __str__(self):
+        return f"{self.category_id}: {self.units} units"
@@ -0,0 +1,97 @@
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Now
+
+from .instrumentation import QueryCounter
+from .inventory import commit_order_stock, reserve_stock
+from .models import Order, OrderItem
+from .sales import sync_sales
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_FIELDS = ['email', 'first_name', 'last_name', 'phone', 'address', 'city', 'postal_code', 'country']
+
+
+class EmptyCart(Exception):
+    pass
+
+
+@dataclass
+class PlacedOrder:
+    order: Order
+    items: list
+    query_count: int
+
+
+def place_order(cart, customer, user=None, session_key=None):
+    """
+    Turn a cart into an order in one transaction: load the cart lines with
+    their books once, bulk insert the order lines and reserve their stock.
+    Raises EmptyCart or inventory.InsufficientStock.
+    """
+    with QueryCounter() as queries:
+        with transaction.atomic():
+            cart_items = list(cart.items.select_related('book'))
+            if not cart_items:
+                raise EmptyCart()
+
+            total = Decimal('0')
+            lines = {}
+            for item in cart_items:
+                total += item.book.price * item.quantity
+                lines[item.book_id] = item.quantity
+
+            order = Order.objects.create(
+                user=user,
+                session_key=session_key,
+                total_amount=total,
+                **{field: customer.get(field) for field in CUSTOMER_FIELDS if customer.get(field) is not None},
+            )
+            items = OrderItem.objects.bulk_create([
+                OrderItem(order=order, book=item.book, quantity=item.quantity, price=item.book.price)
+                for item in cart_items
+            ])
+            reserve_stock(order, lines)
+
+    logger.debug("Placed order #%s with %d lines in %d queries", order.id, len(items), queries.count)
+    return PlacedOrder(order=order, items=items, query_count=queries.count)
+
+
+def confirm_order(order):
+    """
+    Make a paid order's sale permanent and add it to the sales rollups.
+    Returns False if it was already confirmed; may raise InsufficientStock.
+    """
+    with transaction.atomic():
+        confirmed = commit_order_stock(order)
+        if confirmed:
+            sync_sales([order.id])
+    return confirmed
+
+
+def status_summary():
+    """Order count and revenue per status from a single GROUP BY"""
+    rows = Order.objects.order_by().values('status').annotate(count=Count('id'), revenue=Sum('total_amount'))
+    summary = {status: {'count': 0, 'revenue': Decimal('0')} for status, _ in Order.STATUS_CHOICES}
+    for row in rows:
+        summary[row['status']] = {'count': row['count'], 'revenue': row['revenue'] or Decimal('0')}
+    return summary
+
+
+def set_order_status(order_ids, status):
+    """
+    Move many orders to `status` with one UPDATE and keep the sales rollups
+    in step with any cancellations. Returns the number of orders changed.
+    """
+    if status not in dict(Order.STATUS_CHOICES):
+        raise ValueError(f"Unknown order status: {status}")
+    order_ids = list(order_ids)
+    with transaction.atomic():
+        updated = Order.objects.filter(id__in=order_ids).exclude(status=status).update(status=status, updated_at=Now())
+        if updated:
+            sync_sales(order_ids)
+    return updated
@@ -0,0 +1,180 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its rounding to milliseconds: cursor values must equal the stored ones"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_page_size():
+    return getattr(settings, 'BOOKSTORE_PAGE_SIZE', 24)
+
+
+class KeysetPage:
+    """One page of results plus opaque cursors to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetStream:
+    """Rows of one forward page read lazily; next_cursor is set once they run out"""
+
+    def __init__(self, paginator, rows):
+        self.paginator = paginator
+        self.rows = rows
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        for index, row in enumerate(self.rows):
+            if index == self.paginator.per_page:
+                self.next_cursor = self.paginator.encode_cursor(last, 'next')
+                break
+            last = row
+            yield row
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered by non-null fields ending in a
+    unique one, e.g. ('title', 'id') or ('-created_at', '-id'). Each page is a
+    single indexed range query: no OFFSET and no COUNT(*).
+    """
+
+    def __init__(self, queryset, ordering, per_page=None):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page or get_page_size()
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        payload = [direction, [self._value(obj, field) for field in self.fields]]
+        data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(data)
+        except (ValueError, TypeError):
+            return None
+        if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(self.fields):
+            return None
+        return direction, values
+
+    def _value(self, obj, field):
+        if isinstance(obj, dict):
+            return obj[field]
+        return getattr(obj, field)
+
+    def _after(self, values, backwards):
+        """Q matching rows strictly after `values` in (possibly reversed) ordering"""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = self.fields[index]
+            descending = field.startswith('-') != backwards
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            for previous in range(index):
+                step &= Q(**{self.fields[previous]: values[previous]})
+            condition |= step
+        return condition
+
+    def get_page(self, cursor=None):
+        try:
+            queryset, direction = self._page_queryset(cursor)
+            rows = list(queryset)
+        except (ValidationError, ValueError, TypeError):
+            if not cursor:
+                raise
+            return self.get_page()
+        return self._build_page(rows, direction)
+
+    async def aget_page(self, cursor=None):
+        """get_page() for async views, using the async ORM"""
+        try:
+            queryset, direction = self._page_queryset(cursor)
+            rows = [row async for row in queryset]
+        except (ValidationError, ValueError, TypeError):
+            if not cursor:
+                raise
+            return await self.aget_page()
+        return self._build_page(rows, direction)
+
+    def stream_page(self, cursor=None, chunk_size=500):
+        """
+        Forward-only get_page() for large pages: rows come off the database
+        cursor in chunks instead of being built into a list. 'prev' cursors
+        and bad ones start from the first page.
+        """
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None or decoded[0] != 'next':
+            cursor = None
+        try:
+            queryset, _ = self._page_queryset(cursor)
+        except (ValidationError, ValueError, TypeError):
+            if not cursor:
+                raise
+            queryset, _ = self._page_queryset(None)
+        return KeysetStream(self, queryset.iterator(chunk_size=chunk_size))
+
+    def _page_queryset(self, cursor):
+        """Slice fetching one row past the page; direction is None for the first page"""
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return self.queryset.order_by(*self.ordering)[:self.per_page + 1], None
+        direction, values = decoded
+        backwards = direction == 'prev'
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(f[1:] if f.startswith('-') else '-' + f for f in ordering)
+        return self.queryset.filter(self._after(values, backwards)).order_by(*ordering)[:self.per_page + 1], direction
+
+    def _build_page(self, rows, direction):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction is None:
+            return self._page(rows, has_next=has_more, has_previous=False)
+        if direction == 'prev':
+            rows.reverse()
+            return self._page(rows, has_next=True, has_previous=has_more)
+        return self._page(rows, has_next=has_more, has_previous=True)
+
+    def _page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], 'next')
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], 'prev')
+        return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,105 @@
+"""
+"Customers also bought" recommendations.
+
+BookPair counts, for every two books, the confirmed orders holding both.
+When sync_sales records or takes back orders, only the lines of those
+orders are paired and added or subtracted, inside the same transaction,
+so checkout does the same work however long the order history is. The
+top BOOKSTORE_RECOMMENDATIONS_PER_BOOK pairs of each touched book are then
+copied to BookRecommendation, which book_detail reads back with a single
+indexed query. rebuild_recommendations recounts everything from scratch;
+rebuild_sales empties the counts and refills them batch by batch.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Book, BookPair, BookRecommendation, Order, OrderItem
+from .sales import add_totals
+
+
+def get_recommendations_per_book():
+    return getattr(settings, 'BOOKSTORE_RECOMMENDATIONS_PER_BOOK', 6)
+
+
+def order_pairs(orders):
+    """{'book_id', 'other_id', 'orders'} for every two books sharing one of `orders`"""
+    return (
+        OrderItem.objects.filter(order__in=orders)
+        .annotate(other_id=F('order__items__book_id'))
+        .filter(~Q(other_id=F('book_id')))
+        .values('book_id', 'other_id')
+        # (order, book) is unique, so each row of a pair is one order
+        .annotate(orders=Count('id'))
+        .order_by()
+    )
+
+
+def record_orders(added, removed):
+    """Count the pairs of newly confirmed orders in, and cancelled ones out"""
+    for order_ids, sign in ((added, 1), (removed, -1)):
+        if order_ids:
+            add_totals(BookPair, ['book_id', 'other_id'], order_pairs(order_ids), ['orders'], sign)
+    book_ids = set(OrderItem.objects.filter(order_id__in=list(added) + list(removed)).values_list('book_id', flat=True))
+    if removed:
+        BookPair.objects.filter(book_id__in=book_ids, orders__lte=0).delete()
+    refresh_recommendations(book_ids)
+
+
+def forget_orders():
+    """Drop every pair count, for rebuild_sales to record each order again"""
+    BookPair.objects.all().delete()
+
+
+def refresh_recommendations(book_ids):
+    """Copy the top pairs of `book_ids` to BookRecommendation; returns rows written"""
+    book_ids = list(book_ids)
+    if not book_ids:
+        return 0
+    top = BookPair.objects.filter(book_id__in=book_ids, orders__gt=0).annotate(position=Window(
+        RowNumber(), partition_by=F('book_id'), order_by=[F('orders').desc(), F('other_id').asc()],
+    )).filter(position__lte=get_recommendations_per_book())
+    rows = [
+        BookRecommendation(book_id=book_id, recommended_id=other_id, rank=position - 1, orders=orders)
+        for book_id, other_id, position, orders in top.values_list('book_id', 'other_id', 'position', 'orders')
+    ]
+    with transaction.atomic():
+        BookRecommendation.objects.filter(book_id__in=book_ids).delete()
+        BookRecommendation.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_recommendations(batch_size=500):
+    """
+    Recount every pair from the orders recorded as sales, then recompute
+    every book's neighbours in batches of book ids. Yields the running
+    number of books processed after each batch.
+    """
+    with transaction.atomic():
+        BookPair.objects.all().delete()
+        pairs = order_pairs(Order.objects.filter(sales_recorded=True)).iterator(chunk_size=2000)
+        while chunk := list(islice(pairs, 2000)):
+            BookPair.objects.bulk_create(BookPair(**row) for row in chunk)
+
+    last_id, total = 0, 0
+    while True:
+        ids = list(Book.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        refresh_recommendations(ids)
+        total += len(ids)
+        last_id = ids[-1]
+        yield total
+
+
+def recommendations_for(book):
+    """Stored neighbours of `book` that can be bought now, in one query"""
+    return [
+        recommendation.recommended
+        for recommendation in BookRecommendation.objects.filter(
+            book=book, recommended__stock_quantity__gt=0,
+        ).select_related('recommended__author').order_by('rank')
+    ]
@@ -0,0 +1,36 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'catalog_read'
+
+# Catalog tables read by the browsing views
+CATALOG_MODELS = {'author', 'book', 'category', 'book_categories'}
+
+
+class CatalogReadRouter:
+    """
+    Send catalog reads to the read-only alias. Reads made inside a
+    transaction on the default connection stay there, so code that writes
+    and then reads back (stock checks, imports) sees its own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        meta = model._meta
+        if meta.app_label != 'bookstore' or meta.model_name not in CATALOG_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database file
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, READ_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == READ_ALIAS:
+            return False
+        return None
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import BookSales, CategorySales, DailySales, Order, OrderItem
+
+# Orders that count as sales: paid for and not cancelled since
+CONFIRMED = Q(stock_committed=True) & ~Q(status='cancelled')
+
+# Sent inside sync_sales's transaction with the ids of orders that started
+# (added) and stopped (removed) counting as sales
+sales_changed = Signal()
+
+# Sent inside rebuild_sales's first transaction, once no order is recorded;
+# receivers drop what they derived from sales_changed, which then re-adds
+# every order batch by batch
+sales_reset = Signal()
+
+
+def sync_sales(order_ids):
+    """
+    Bring the rollups in line with the current state of `order_ids`:
+    newly confirmed orders are added and cancelled ones taken back out.
+    The sales_recorded flag makes this safe to call any number of times.
+    Returns (added, removed).
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0, 0
+    with transaction.atomic():
+        orders = Order.objects.select_for_update().filter(id__in=order_ids)
+        added = list(orders.filter(CONFIRMED, sales_recorded=False).values_list('id', flat=True))
+        removed = list(orders.filter(sales_recorded=True).exclude(CONFIRMED).values_list('id', flat=True))
+        if added:
+            Order.objects.filter(id__in=added).update(sales_recorded=True)
+            apply_sales(added, 1)
+        if removed:
+            Order.objects.filter(id__in=removed).update(sales_recorded=False)
+            apply_sales(removed, -1)
+        if added or removed:
+            sales_changed.send(sender=Order, added=added, removed=removed)
+    return len(added), len(removed)
+
+
+def apply_sales(order_ids, sign):
+    """Add (sign=1) or subtract (sign=-1) the lines of `order_ids` from every rollup"""
+    lines = OrderItem.objects.filter(order_id__in=order_ids).order_by()
+    totals = {'units': Sum('quantity'), 'revenue': Sum(F('quantity') * F('price'))}
+
+    by_day = lines.values(date=TruncDate('order__created_at')).annotate(orders=Count('order_id', distinct=True), **totals)
+    by_book = lines.values('book_id').annotate(**totals)
+    by_category = lines.filter(book__categories__isnull=False).values(category_id=F('book__categories')).annotate(**totals)
+
+    add_totals(DailySales, ['date'], by_day, ['orders', 'units', 'revenue'], sign)
+    add_totals(BookSales, ['book_id'], by_book, ['units', 'revenue'], sign)
+    add_totals(CategorySales, ['category_id'], by_category, ['units', 'revenue'], sign)
+
+
+def add_totals(model, keys, rows, fields, sign=1, chunk_size=200):
+    """
+    Add sign * each row's `fields` to the row of `model` with the same
+    `keys` (unique together), creating it when missing: one
+    INSERT ... ON CONFLICT DO UPDATE per chunk of rows
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    key_fields = [model._meta.get_field(key) for key in keys]
+    total_fields = [model._meta.get_field(field) for field in fields]
+    quote = lambda field: connection.ops.quote_name(field.column)  # noqa: E731
+    columns = ', '.join(quote(field) for field in key_fields + total_fields)
+    conflict = ', '.join(quote(field) for field in key_fields)
+    updates = ', '.join(f'{quote(field)} = {table}.{quote(field)} + excluded.{quote(field)}' for field in total_fields)
+    placeholder = '(' + ', '.join(['%s'] * (len(keys) + len(fields))) + ')'
+
+    rows = list(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            params = []
+            for row in chunk:
+                params.extend(field.get_db_prep_save(row[key], connection) for key, field in zip(keys, key_fields))
+                params.extend(field.get_db_prep_save(sign * row[name], connection) for name, field in zip(fields, total_fields))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(chunk))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
+
+
+def rebuild_sales(batch_size=1000):
+    """
+    Recompute every rollup from Order/OrderItem in batches of orders, each
+    in its own short transaction so checkout is only ever blocked briefly.
+    The first transaction empties the rollups and clears every
+    sales_recorded flag; each batch then goes through sync_sales, so orders
+    confirmed or cancelled meanwhile still count exactly once. Yields the
+    running number of orders recorded after each batch.
+    """
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        BookSales.objects.all().delete()
+        CategorySales.objects.all().delete()
+        Order.objects.filter(sales_recorded=True).update(sales_recorded=False)
+        sales_reset.send(sender=Order)
+
+    last_id, total = 0, 0
+    while True:
+        ids = list(
+            Order.objects.filter(CONFIRMED, id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        added, _ = sync_sales(ids)
+        total += added
+        last_id = ids[-1]
+        yield total
+
+
+def daily_sales(days=30):
+    """Rollup rows for the last `days` days, oldest first"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(DailySales.objects.filter(date__gte=since).order_by('date'))
@@ -0,0 +1,181 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Book
+
+FTS_TABLE = 'bookstore_book_fts'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_ISBN_HYPHEN_RE = re.compile(r'(?<=\d)[-\s](?=\d)')
+
+
+def normalize_query(query):
+    """Collapse whitespace and join hyphenated ISBN digits"""
+    query = ' '.join((query or '').split())
+    return _ISBN_HYPHEN_RE.sub('', query)
+
+
+class BaseSearchBackend:
+    """Interface every catalog search backend implements"""
+
+    def search(self, queryset, query):
+        """Filter a Book queryset to matches, annotated with `search_rank` (lower is better)"""
+        raise NotImplementedError
+
+    def matching(self, queryset, query):
+        """search() without the ranking, safe to use as a subquery"""
+        return self.search(queryset, query)
+
+    def index_books(self, book_ids):
+        pass
+
+    def remove_books(self, book_ids):
+        pass
+
+    def rebuild(self, batch_size=2000):
+        return 0
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Portable fallback using icontains lookups, for databases without a search index"""
+
+    def search(self, queryset, query):
+        query = normalize_query(query)
+        if not query:
+            return queryset.annotate(search_rank=Value(0)).none()
+        category_matches = Book.categories.through.objects.filter(
+            category__name__icontains=query
+        ).values('book_id')
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(author__name__icontains=query) |
+            Q(isbn__icontains=query) |
+            Q(id__in=category_matches)
+        ).annotate(search_rank=Case(
+            When(title__istartswith=query, then=Value(0)),
+            When(title__icontains=query, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ))
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 index over title, author name, ISBN and category names"""
+
+    # bm25 column weights: title, author, isbn, categories
+    weights = (10.0, 5.0, 8.0, 2.0)
+
+    def match_expression(self, query):
+        tokens = _TOKEN_RE.findall(normalize_query(query))
+        return ' '.join('"%s"*' % token for token in tokens)
+
+    def match_filter(self, query):
+        """id__in condition on the books matching `query`, or None if it has no terms"""
+        match = self.match_expression(query)
+        if not match:
+            return None
+        return RawSQL('SELECT rowid FROM %s WHERE %s MATCH %%s' % (FTS_TABLE, FTS_TABLE), [match])
+
+    def search(self, queryset, query):
+        # Joining the index keeps any later filters and the keyset slice in
+        # the same statement, so nothing is cut before they apply. The raw
+        # join names the book table, so use matching() for subqueries.
+        match = self.match_expression(query)
+        if not match:
+            # Still annotated, so callers can order by search_rank
+            return queryset.annotate(search_rank=Value(0.0)).none()
+        quote = connection.ops.quote_name
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                '%s.rowid = %s.%s' % (quote(FTS_TABLE), quote(Book._meta.db_table), quote(Book._meta.pk.column)),
+                '%s MATCH %%s' % quote(FTS_TABLE),
+            ],
+            params=[match],
+        ).annotate(search_rank=RawSQL(
+            'bm25(%s, %s)' % (quote(FTS_TABLE), ', '.join(str(w) for w in self.weights)), [],
+            output_field=FloatField(),
+        ))
+
+    def matching(self, queryset, query):
+        condition = self.match_filter(query)
+        if condition is None:
+            return queryset.none()
+        return queryset.filter(id__in=condition)
+
+    def _documents(self, book_ids):
+        books = Book.objects.filter(id__in=book_ids).values_list('id', 'title', 'author__name', 'isbn')
+        categories = {}
+        rows = Book.categories.through.objects.filter(book_id__in=book_ids).values_list('book_id', 'category__name')
+        for book_id, name in rows:
+            categories.setdefault(book_id, []).append(name)
+        for book_id, title, author_name, isbn in books:
+            yield (book_id, title, author_name or '', isbn or '', ' '.join(categories.get(book_id, [])))
+
+    def index_books(self, book_ids):
+        book_ids = list(book_ids)
+        if not book_ids:
+            return
+        documents = list(self._documents(book_ids))
+        with connection.cursor() as cursor:
+            self._delete(cursor, book_ids)
+            cursor.executemany(
+                'INSERT INTO %s (rowid, title, author, isbn, categories) VALUES (%%s, %%s, %%s, %%s, %%s)' % FTS_TABLE,
+                documents,
+            )
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, book_ids)
+
+    def _delete(self, cursor, book_ids):
+        cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [(i,) for i in book_ids])
+
+    def rebuild(self, batch_size=2000):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % FTS_TABLE)
+        total = 0
+        last_id = 0
+        while True:
+            ids = list(Book.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            self.index_books(ids)
+            total += len(ids)
+            last_id = ids[-1]
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO {0}({0}) VALUES ('optimize')".format(FTS_TABLE))
+        return total
+
+
+def fts_available():
+    """True when the FTS5 table was created by the migrations"""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Return the configured backend, auto-selecting FTS5 on SQLite"""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'BOOKSTORE_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif fts_available():
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = DatabaseSearchBackend()
+    return _backend
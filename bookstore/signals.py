@@ -0,0 +1,214 @@
+import logging
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, counters
+from .cart import merge_cookie_cart
+from .facets import bump_catalog_version
+from .models import Author, Book, Category
+from .recommendations import forget_orders, record_orders
+from .sales import sales_changed, sales_reset
+from .search import get_search_backend
+from .thumbnails import COVER_SIZES, PHOTO_SIZES, generate_all
+
+logger = logging.getLogger(__name__)
+
+BookCategories = Book.categories.through
+
+
+def touch_books(book_ids):
+    """Bump updated_at so cached book fragments keyed on it are rebuilt"""
+    book_ids = list(book_ids)
+    if book_ids:
+        Book.objects.filter(id__in=book_ids).update(updated_at=Now())
+
+
+def _image_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def generate_thumbnails_on_commit(field_file, sizes):
+    """Build the derivatives of a newly uploaded image once the save commits"""
+    def generate():
+        try:
+            generate_all(field_file, sizes)
+        except OSError:
+            logger.warning("Could not generate thumbnails for %s", field_file.name, exc_info=True)
+    transaction.on_commit(generate)
+
+
+@receiver(post_init, sender=Book)
+def remember_loaded_book(sender, instance, **kwargs):
+    # Read from __dict__ so deferred loads don't trigger a query
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+    instance._loaded_image = _image_name(instance.__dict__.get('cover_image'))
+    instance._loaded_label = (instance.__dict__.get('title'), instance.__dict__.get('isbn'))
+
+
+@receiver(post_init, sender=Author)
+def remember_author_photo(sender, instance, **kwargs):
+    instance._loaded_image = _image_name(instance.__dict__.get('photo'))
+    instance._loaded_label = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+def thumbnail_uploaded_image(sender, instance, raw=False, **kwargs):
+    if sender is Book:
+        field_file, sizes = instance.cover_image, COVER_SIZES
+    else:
+        field_file, sizes = instance.photo, PHOTO_SIZES
+    if not raw and field_file and field_file.name != instance._loaded_image:
+        instance._loaded_image = field_file.name
+        generate_thumbnails_on_commit(field_file, sizes)
+
+
+@receiver(pre_save, sender=Book)
+def load_previous_author(sender, instance, raw=False, update_fields=None, **kwargs):
+    # .only() and .defer() loads may not have read author_id
+    if raw or instance._state.adding or instance._loaded_author_id is not None:
+        return
+    if update_fields is None or {'author', 'author_id'} & set(update_fields):
+        instance._loaded_author_id = Book.objects.filter(id=instance.id).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_author_id = instance._loaded_author_id
+    if created:
+        counters.adjust_author_count(instance.author_id, 1)
+    elif previous_author_id and previous_author_id != instance.author_id:
+        counters.adjust_author_count(previous_author_id, -1)
+        counters.adjust_author_count(instance.author_id, 1)
+    instance._loaded_author_id = instance.author_id
+    get_search_backend().index_books([instance.id])
+
+
+@receiver(pre_delete, sender=Book)
+def remember_book_categories(sender, instance, **kwargs):
+    # The through rows are cascade-deleted without m2m_changed
+    instance._deleted_category_ids = list(
+        BookCategories.objects.filter(book_id=instance.id).values_list('category_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    counters.adjust_author_count(instance.author_id, -1)
+    counters.adjust_category_counts(getattr(instance, '_deleted_category_ids', []), -1)
+    get_search_backend().remove_books([instance.id])
+
+
+@receiver(m2m_changed, sender=BookCategories)
+def book_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_remove':
+        # remove() reports every pk it was given, linked or not
+        links = BookCategories.objects.filter(
+            **({'category_id': instance.id, 'book_id__in': pk_set} if reverse
+               else {'book_id': instance.id, 'category_id__in': pk_set})
+        )
+        instance._removed_pks = set(links.values_list('book_id' if reverse else 'category_id', flat=True))
+        return
+    if action == 'pre_clear':
+        links = BookCategories.objects.filter(**({'category_id': instance.id} if reverse else {'book_id': instance.id}))
+        instance._removed_pks = set(links.values_list('book_id' if reverse else 'category_id', flat=True))
+        return
+    if action == 'post_add':
+        changed, delta = set(pk_set or ()), 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, delta = getattr(instance, '_removed_pks', set()), -1
+    else:
+        return
+    if not changed:
+        return
+
+    if reverse:
+        counters.adjust_category_counts([instance.id], delta * len(changed))
+        book_ids = changed
+    else:
+        counters.adjust_category_counts(changed, delta)
+        book_ids = [instance.id]
+    touch_books(book_ids)
+    get_search_backend().index_books(book_ids)
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        get_search_backend().index_books(instance.books.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_books(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        book_ids = list(instance.books.values_list('id', flat=True))
+        touch_books(book_ids)
+        get_search_backend().index_books(book_ids)
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_books(sender, instance, **kwargs):
+    instance._search_book_ids = list(instance.books.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_deleted_category_books(sender, instance, **kwargs):
+    book_ids = getattr(instance, '_search_book_ids', None)
+    if book_ids:
+        touch_books(book_ids)
+        get_search_backend().index_books(book_ids)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def retire_cached_facets(sender, raw=False, **kwargs):
+    # Renames and edits that move books in or out of a search; count
+    # changes already bump the version through the counters
+    if not raw:
+        bump_catalog_version()
+
+
+@receiver(post_save, sender=Book)
+def update_autocomplete_book(sender, instance, created, raw=False, **kwargs):
+    # Stock and price edits leave the index alone
+    label = (instance.title, instance.isbn)
+    if not raw and (created or label != instance._loaded_label):
+        instance._loaded_label = label
+        autocomplete.update_on_commit('book', [instance.id])
+
+
+@receiver(post_save, sender=Author)
+def update_autocomplete_author(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance.name != instance._loaded_label):
+        instance._loaded_label = instance.name
+        autocomplete.update_on_commit('author', [instance.id])
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Book)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    autocomplete.update_on_commit('book' if sender is Book else 'author', [instance.id], deleted=True)
+
+
+@receiver(sales_changed)
+def update_recommendations(sender, added, removed, **kwargs):
+    record_orders(added, removed)
+
+
+@receiver(sales_reset)
+def reset_recommendations(sender, **kwargs):
+    forget_orders()
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_cookie_cart(request, user)
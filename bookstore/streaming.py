@@ -0,0 +1,32 @@
+"""
+StreamingHttpResponse content that stays streamed under ASGI.
+
+Django's ASGI handler reads a sync iterator into a list before sending a
+byte of it, so under ASGI the chunks are pulled in batches through
+sync_to_async instead. Thread-sensitive calls all run on one thread, the
+one that ran a sync view, so its open database cursors keep working.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# Chunks joined per thread hop
+BATCH_SIZE = 100
+
+
+async def iterate_async(chunks, batch_size=BATCH_SIZE):
+    """Async iterator over a sync iterator of str or bytes chunks, joined in batches"""
+    chunks = iter(chunks)
+    next_batch = sync_to_async(lambda: list(islice(chunks, batch_size)))
+    while batch := await next_batch():
+        # '' or b'', whichever the chunks are
+        yield batch[0][:0].join(batch)
+
+
+def streaming_response(request, chunks, batch_size=BATCH_SIZE, **kwargs):
+    """StreamingHttpResponse over `chunks` that streams under WSGI and ASGI alike"""
+    if isinstance(request, ASGIRequest):
+        chunks = iterate_async(chunks, batch_size)
+    return StreamingHttpResponse(chunks, **kwargs)
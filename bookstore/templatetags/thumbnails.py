@@ -0,0 +1,11 @@
+from django import template
+
+from bookstore.thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail(field_file, size='card', fmt='jpeg'):
+    """{% thumbnail book.cover_image 'card' 'webp' %} -> URL of the derivative"""
+    return thumbnail_url(field_file, size, fmt)
@@ -1,3 +1,1311 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.core.signing import get_cookie_signer
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import autocomplete
+from .cart import COOKIE_NAME, COOKIE_SALT
+from .checks import autocomplete_cache_check
+from .counters import recount_books
+from .facets import catalog_facets
+from .inventory import InsufficientStock, commit_order_stock, release_expired_reservations, take_stock
+from .media import serve_media
+from .middleware import QueryBudgetExceeded
+from .models import (
+    Author, Book, BookPair, BookRecommendation, BookSales, Cart, CartItem, Category, CategorySales, DailySales, Order,
+    OrderItem, StockReservation,
+)
+from .orders import confirm_order, place_order
+from .pagination import KeysetPaginator
+from .recommendations import rebuild_recommendations, recommendations_for
+from .sales import rebuild_sales, sync_sales
+from .search import DatabaseSearchBackend, SQLiteFTSBackend, get_search_backend
+from .thumbnails import thumbnail_name
+
+CUSTOMER = {
+    'email': 'reader@example.com',
+    'first_name': 'Ada',
+    'last_name': 'Reader',
+    'phone': '9999999999',
+    'address': '1 Library Road',
+    'city': 'Chennai',
+    'postal_code': '600001',
+}
+
+
+class PlaceOrderTests(TestCase):
+    def make_cart(self, lines):
+        author = Author.objects.create(name='Author', bio='Bio')
+        cart = Cart.objects.create(session_key='test-session')
+        for i in range(lines):
+            book = Book.objects.create(
+                title=f'Book {i}', price=Decimal('10.50'), author=author,
+                isbn=f'{i:013d}', stock_quantity=5,
+            )
+            CartItem.objects.create(cart=cart, book=book, quantity=2)
+        return cart
+
+    def test_totals_lines_and_stock(self):
+        cart = self.make_cart(3)
+        placed = place_order(cart, CUSTOMER, session_key='test-session')
+
+        self.assertEqual(placed.order.total_amount, Decimal('63.00'))
+        self.assertEqual(OrderItem.objects.filter(order=placed.order).count(), 3)
+        self.assertEqual(list(Book.objects.values_list('stock_quantity', flat=True)), [3, 3, 3])
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        small = place_order(self.make_cart(1), CUSTOMER)
+        Book.objects.all().delete()
+        large = place_order(self.make_cart(30), CUSTOMER)
+
+        self.assertEqual(small.query_count, large.query_count)
+        # 5 statements plus two savepoint pairs from the nested atomic blocks
+        self.assertEqual(large.query_count, 9)
+
+
+# Budgets are set for the session-backed cart, which does the most queries
+@override_settings(BOOKSTORE_CART_BACKEND='database', BOOKSTORE_QUERY_BUDGET_STRICT=True)
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        for i in range(5):
+            book = Book.objects.create(
+                title=f'Book {i}', price=Decimal('5.00'), author=author,
+                isbn=f'{i:013d}', stock_quantity=5,
+            )
+            self.client.post(reverse('add_to_cart', args=[book.id]))
+
+    def test_budgeted_views_stay_within_budget(self):
+        for name in ('view_cart', 'author_list'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(BOOKSTORE_QUERY_BUDGETS={'view_cart': 1})
+    def test_budget_overrun_raises_when_strict(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('view_cart'))
+
+    @override_settings(BOOKSTORE_QUERY_BUDGETS={'view_cart': 1}, BOOKSTORE_QUERY_BUDGET_STRICT=False)
+    def test_budget_overrun_only_logs_by_default(self):
+        with self.assertLogs('bookstore', 'WARNING') as logs:
+            self.assertEqual(self.client.get(reverse('view_cart')).status_code, 200)
+        self.assertIn('view_cart ran', '\n'.join(logs.output))
+
+
+class AdminChangelistQueryTests(TestCase):
+    # Session, user, id range, count and the page of rows; orders also list
+    # their countries for the sidebar filter
+    CHANGELISTS = {'book': 5, 'order': 6, 'orderitem': 5}
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.author = Author.objects.create(name='Author', bio='Bio')
+
+    def add_orders(self, count):
+        start = Book.objects.count()
+        for i in range(start, start + count):
+            book = Book.objects.create(
+                title=f'Book {i}', price=Decimal('5.00'), author=self.author,
+                isbn=f'{i:013d}', stock_quantity=5,
+            )
+            order = Order.objects.create(total_amount=Decimal('5.00'), **CUSTOMER)
+            OrderItem.objects.create(order=order, book=book, quantity=1, price=Decimal('5.00'))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for rows in (2, 20):
+            self.add_orders(rows)
+            for model, queries in self.CHANGELISTS.items():
+                url = reverse(f'admin:bookstore_{model}_changelist')
+                # The first request fills the cached cart badge
+                self.client.get(url)
+                with self.assertNumQueries(queries):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        fiction = Category.objects.create(name='Fiction')
+        poetry = Category.objects.create(name='Poetry')
+        self.books = []
+        for i in range(4):
+            book = Book.objects.create(
+                title=f'Book {i}', price=Decimal('7.25'), author=author,
+                isbn=f'{i:013d}', stock_quantity=50,
+            )
+            book.categories.set([fiction, poetry][:i % 3])
+            self.books.append(book)
+
+    def make_order(self, lines, stock_committed=True):
+        order = Order.objects.create(total_amount=Decimal('0'), stock_committed=stock_committed, **CUSTOMER)
+        for book, quantity in lines:
+            OrderItem.objects.create(order=order, book=book, quantity=quantity, price=book.price)
+        return order
+
+    def rollups(self):
+        return (
+            list(DailySales.objects.order_by('date').values_list('date', 'orders', 'units', 'revenue')),
+            list(BookSales.objects.exclude(units=0).order_by('book_id').values_list('book_id', 'units', 'revenue')),
+            list(CategorySales.objects.exclude(units=0).order_by('category_id').values_list('category_id', 'units', 'revenue')),
+        )
+
+    def test_rebuild_matches_incremental_totals(self):
+        a, b, c, d = self.books
+        orders = [
+            self.make_order([(a, 1), (b, 2)]),
+            self.make_order([(b, 3), (c, 1), (d, 4)]),
+            self.make_order([(c, 2)]),
+            self.make_order([(d, 1)], stock_committed=False),
+        ]
+        self.assertEqual(sync_sales([order.id for order in orders]), (3, 0))
+        Order.objects.filter(id=orders[2].id).update(status='cancelled')
+        self.assertEqual(sync_sales([orders[2].id]), (0, 1))
+        # Syncing again changes nothing
+        self.assertEqual(sync_sales([order.id for order in orders]), (0, 0))
+
+        incremental = self.rollups()
+        self.assertEqual(incremental[1], [(a.id, 1, Decimal('7.25')), (b.id, 5, Decimal('36.25')),
+                                          (c.id, 1, Decimal('7.25')), (d.id, 4, Decimal('29.00'))])
+        self.assertEqual(list(rebuild_sales(batch_size=1)), [1, 2])
+        self.assertEqual(self.rollups(), incremental)
+        self.assertEqual(set(Order.objects.filter(sales_recorded=True).values_list('id', flat=True)),
+                         {orders[0].id, orders[1].id})
+
+    def test_orders_changed_during_a_rebuild_count_once(self):
+        a, b, c, d = self.books
+        first, second, third = [self.make_order([(book, 1), (d, 2)]) for book in (a, b, c)]
+        sync_sales([first.id, second.id, third.id])
+
+        batches = rebuild_sales(batch_size=1)
+        self.assertEqual(next(batches), 1)
+        # Between batches: one order is cancelled before the rebuild reaches
+        # it, and another is placed and confirmed
+        Order.objects.filter(id=third.id).update(status='cancelled')
+        self.assertEqual(sync_sales([third.id]), (0, 0))
+        placed = self.make_order([(a, 3)])
+        self.assertEqual(sync_sales([placed.id]), (1, 0))
+        self.assertEqual(list(batches), [2, 2])
+
+        rebuilt = self.rollups()
+        self.assertEqual(list(rebuild_sales()), [3])
+        self.assertEqual(self.rollups(), rebuilt)
+        self.assertEqual(rebuilt[1], [(a.id, 4, Decimal('29.00')), (b.id, 1, Decimal('7.25')), (d.id, 4, Decimal('29.00'))])
+
+    def test_command_rebuilds_in_batches(self):
+        for book in self.books:
+            self.make_order([(book, 1)])
+        out = io.StringIO()
+        call_command('rebuild_sales_rollups', '--batch-size', '3', verbosity=2, stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[:2], ['  3 orders recorded', '  4 orders recorded'])
+        self.assertEqual(BookSales.objects.filter(units=1).count(), 4)
+
+
+class CatalogFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tolkien = Author.objects.create(name='Tolkien', bio='Bio')
+        self.lewis = Author.objects.create(name='Lewis', bio='Bio')
+        self.fantasy = Category.objects.create(name='Fantasy')
+        for i in range(6):
+            book = Book.objects.create(
+                title=f'Dragon Tale {i}', price=Decimal('5.00'), author=[self.tolkien, self.lewis][i % 2],
+                isbn=f'{i:013d}', stock_quantity=5,
+            )
+            book.categories.add(self.fantasy)
+
+    def test_search_facets_count_every_match(self):
+        facets = catalog_facets('dragon')
+        self.assertEqual(facets['categories'], [{'id': self.fantasy.id, 'name': 'Fantasy', 'count': 6}])
+        self.assertEqual(
+            [(entry['name'], entry['count']) for entry in facets['authors']], [('Lewis', 3), ('Tolkien', 3)]
+        )
+
+    def test_other_facet_narrows_counts(self):
+        facets = catalog_facets('tale', author_id=str(self.lewis.id))
+        self.assertEqual(facets['categories'][0]['count'], 3)
+        # The author facet itself still counts every author
+        self.assertEqual(len(facets['authors']), 2)
+
+
+class CatalogSearchTests(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='Ursula Le Guin', bio='Bio')
+        self.other = Author.objects.create(name='Wizard Hall', bio='Bio')
+        self.wizard = self.add_book('A Wizard of Earthsea', self.author, '9780553383041')
+        self.tombs = self.add_book('The Tombs of Atuan', self.author, '9780689845369')
+        self.by_name = self.add_book('Collected Stories', self.other, '9780000000001')
+
+    def add_book(self, title, author, isbn):
+        return Book.objects.create(title=title, price=Decimal('9.00'), author=author, isbn=isbn, stock_quantity=3)
+
+    def search(self, query, queryset=None):
+        books = get_search_backend().search(queryset or Book.objects.all(), query)
+        return list(books.order_by('search_rank', 'id').values_list('title', flat=True))
+
+    def test_fts_is_selected_on_sqlite(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTSBackend)
+
+    def test_title_matches_rank_above_author_matches(self):
+        self.assertEqual(self.search('wizard'), ['A Wizard of Earthsea', 'Collected Stories'])
+        self.assertEqual(self.search('earth'), ['A Wizard of Earthsea'])
+        self.assertEqual(self.search('978-0-689-84536-9'), ['The Tombs of Atuan'])
+        self.assertEqual(self.search('!!'), [])
+
+    def test_filters_and_pages_cover_every_match(self):
+        for i in range(30):
+            self.add_book(f'Wizard Almanac {i}', self.other if i % 3 else self.author, f'97810000{i:05d}')
+        expected = set(Book.objects.filter(title__icontains='wizard', author=self.author).values_list('id', flat=True))
+        seen, cursor = [], None
+        with self.settings(BOOKSTORE_PAGE_SIZE=4):
+            while True:
+                response = self.client.get(reverse('book_list'), {
+                    'search': 'wizard', 'author': self.author.id, 'format': 'json', 'cursor': cursor or '',
+                })
+                data = response.json()
+                seen.extend(book['id'] for book in data['results'])
+                cursor = data['next']
+                if not cursor:
+                    break
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), expected)
+
+    def test_signals_keep_the_index_current(self):
+        self.tombs.title = 'The Farthest Shore'
+        self.tombs.save()
+        self.assertEqual(self.search('tombs'), [])
+        self.assertEqual(self.search('farthest'), ['The Farthest Shore'])
+
+        self.other.name = 'Gene Wolfe'
+        self.other.save()
+        self.assertEqual(self.search('wolfe'), ['Collected Stories'])
+
+        poetry = Category.objects.create(name='Poetry')
+        self.by_name.categories.add(poetry)
+        self.assertEqual(self.search('poetry'), ['Collected Stories'])
+        poetry.refresh_from_db()
+        poetry.name = 'Verse'
+        poetry.save()
+        self.assertEqual(self.search('verse'), ['Collected Stories'])
+        self.by_name.categories.remove(poetry)
+        self.assertEqual(self.search('verse'), [])
+
+        self.wizard.delete()
+        self.assertEqual(self.search('earthsea'), [])
+
+    def test_rebuild_indexes_every_book(self):
+        backend = get_search_backend()
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM bookstore_book_fts')
+        self.assertEqual(self.search('atuan'), [])
+        self.assertEqual(backend.rebuild(batch_size=2), 3)
+        self.assertEqual(self.search('atuan'), ['The Tombs of Atuan'])
+
+    def test_database_backend_fallback(self):
+        backend = DatabaseSearchBackend()
+        books = backend.search(Book.objects.all(), 'wiz').order_by('search_rank', 'id')
+        self.assertEqual(list(books.values_list('title', flat=True)), ['A Wizard of Earthsea', 'Collected Stories'])
+        self.assertEqual(list(backend.search(Book.objects.all(), '978-0-689').values_list('title', flat=True)),
+                         ['The Tombs of Atuan'])
+        self.assertFalse(backend.search(Book.objects.all(), '   ').exists())
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(name='Octavia Butler', bio='Bio')
+        self.book = Book.objects.create(
+            title='Parable of the Sower', price=Decimal('8.00'), author=self.author,
+            isbn='9780446675505', stock_quantity=4,
+        )
+        autocomplete.refresh_index()
+
+    def labels(self, query):
+        response = self.client.get(reverse('autocomplete'), {'q': query})
+        return [result['label'] for result in response.json()['results']]
+
+    def test_prefixes_of_any_word_and_isbn(self):
+        self.assertEqual(self.labels('sow'), ['Parable of the Sower'])
+        self.assertEqual(self.labels('butl'), ['Octavia Butler'])
+        self.assertEqual(self.labels('978044667'), ['Parable of the Sower'])
+
+    def test_edits_patch_this_workers_index(self):
+        version = autocomplete.index_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = 'Parable of the Talents'
+            self.book.save()
+            Book.objects.create(
+                title='Kindred', price=Decimal('8.00'), author=self.author, isbn='9780807083697', stock_quantity=1,
+            )
+        index = autocomplete.get_index()
+        self.assertEqual(index.version, version + 2)
+        self.assertFalse(autocomplete.is_stale(index, autocomplete.index_version()))
+        self.assertEqual(self.labels('sow'), [])
+        self.assertEqual(self.labels('talent'), ['Parable of the Talents'])
+        self.assertEqual(self.labels('kin'), ['Kindred'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assertEqual(self.labels('kin'), [])
+        self.assertEqual(self.labels('octavia'), [])
+
+    def test_stock_edits_leave_the_index_alone(self):
+        version = autocomplete.index_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.stock_quantity = 0
+            self.book.save()
+        self.assertEqual(autocomplete.index_version(), version)
+
+    def test_other_workers_changes_rebuild_off_the_request(self):
+        index = autocomplete.get_index()
+        # Another worker's commit
+        cache.incr(autocomplete.VERSION_KEY)
+        with mock.patch('bookstore.autocomplete.rebuild_in_background') as rebuild:
+            self.assertIs(autocomplete.get_index(), index)
+        rebuild.assert_called_once_with()
+        self.assertEqual(autocomplete.refresh_index().version, autocomplete.index_version())
+
+    def test_deploy_check_wants_a_shared_cache(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with self.settings(CACHES=local):
+            self.assertEqual([error.id for error in autocomplete_cache_check(None)], ['bookstore.W001'])
+        with self.settings(CACHES=shared):
+            self.assertEqual(autocomplete_cache_check(None), [])
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        self.books = [
+            Book.objects.create(
+                title=f'Book {i}', price=Decimal('4.00'), author=author, isbn=f'{i:013d}', stock_quantity=9,
+            )
+            for i in range(4)
+        ]
+
+    def confirm(self, *books):
+        order = Order.objects.create(total_amount=Decimal('0'), stock_committed=True, **CUSTOMER)
+        for book in books:
+            OrderItem.objects.create(order=order, book=book, quantity=1, price=book.price)
+        sync_sales([order.id])
+        return order
+
+    def pairs(self):
+        return sorted(BookPair.objects.values_list('book_id', 'other_id', 'orders'))
+
+    def test_orders_update_pairs_and_rankings(self):
+        a, b, c, d = self.books
+        self.confirm(a, b)
+        self.confirm(a, b, c)
+        cancelled = self.confirm(a, d)
+        self.assertEqual(recommendations_for(a), [b, c, d])
+
+        Order.objects.filter(id=cancelled.id).update(status='cancelled')
+        sync_sales([cancelled.id])
+        self.assertEqual(recommendations_for(a), [b, c])
+        self.assertEqual(recommendations_for(d), [])
+        self.assertEqual(self.pairs(), sorted([
+            (a.id, b.id, 2), (b.id, a.id, 2), (a.id, c.id, 1), (c.id, a.id, 1), (b.id, c.id, 1), (c.id, b.id, 1),
+        ]))
+
+        incremental = self.pairs(), list(BookRecommendation.objects.values_list('book_id', 'recommended_id', 'rank'))
+        list(rebuild_recommendations(batch_size=2))
+        self.assertEqual(
+            (self.pairs(), list(BookRecommendation.objects.values_list('book_id', 'recommended_id', 'rank'))),
+            incremental,
+        )
+        # Rebuilding the sales rollups records every order again, once
+        list(rebuild_sales(batch_size=1))
+        self.assertEqual(
+            (self.pairs(), list(BookRecommendation.objects.values_list('book_id', 'recommended_id', 'rank'))),
+            incremental,
+        )
+
+    def test_confirming_an_order_ignores_history(self):
+        a, b, c, d = self.books
+
+        def confirm_queries():
+            order = Order.objects.create(total_amount=Decimal('0'), stock_committed=True, **CUSTOMER)
+            for book in (a, b, c):
+                OrderItem.objects.create(order=order, book=book, quantity=1, price=book.price)
+            with CaptureQueriesContext(connection) as queries:
+                sync_sales([order.id])
+            return len(queries)
+
+        first = confirm_queries()
+        for _ in range(10):
+            self.confirm(a, b, d)
+        self.assertEqual(confirm_queries(), first)
+
+    def test_sold_out_recommendation_changes_book_detail_validator(self):
+        a, b = self.books[:2]
+        self.confirm(a, b)
+        url = reverse('book_detail', args=[a.id])
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with transaction.atomic():
+            take_stock({b.id: 9})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b, response.context['recommendations'])
+
+
+class CatalogApiStreamingTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        for i in range(300):
+            Book.objects.create(title=f'Book {i:03d}', price=Decimal('3.00'), author=author, isbn=f'{i:013d}')
+        self.url = reverse('api_book_list')
+
+    def test_streams_chunks_under_wsgi(self):
+        response = self.client.get(self.url, {'limit': 250, 'fields': 'id,title,categories'})
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 250)
+        data = json.loads(b''.join(chunks))
+        self.assertEqual(len(data['results']), 250)
+        first = Book.objects.get(title='Book 000')
+        self.assertEqual(data['results'][0], {'id': first.id, 'title': 'Book 000', 'categories': []})
+        self.assertIsNotNone(data['next'])
+
+    async def test_streams_async_chunks_under_asgi(self):
+        response = await AsyncClient().get(self.url, {'limit': 250, 'fields': 'id'})
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        # Batches of rows, not one buffered body
+        self.assertGreater(len(chunks), 2)
+        data = json.loads(b''.join(chunks))
+        self.assertEqual(len(data['results']), 250)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        self.book = Book.objects.create(title='@risk', price=Decimal('6.00'), author=author, isbn='0000000000001')
+        self.orders = {}
+        for day, status, first_name in [
+            (date(2026, 3, 1), 'pending', '=HYPERLINK("http://example.com")'),
+            (date(2026, 3, 2), 'shipped', 'Ada'),
+            (date(2026, 3, 2), 'cancelled', 'Grace'),
+            (date(2026, 3, 3), 'pending', '-2+3'),
+        ]:
+            order = Order.objects.create(
+                total_amount=Decimal('6.00'), status=status, **{**CUSTOMER, 'first_name': first_name},
+            )
+            OrderItem.objects.create(order=order, book=self.book, quantity=1, price=Decimal('6.00'))
+            # Early morning in the store's time zone, still the day before in UTC
+            created_at = timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=2))
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+            self.orders[order.id] = (day, status)
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command('export_orders', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_date_range_and_status_filters(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('--from', '2026-03-02', '--to', '2026-03-03'))))
+        self.assertEqual(sorted(self.orders[int(row['order_id'])][0].day for row in rows), [2, 2, 3])
+
+        rows = list(csv.DictReader(io.StringIO(
+            self.export('--from', '2026-03-02', '--status', 'pending', '--status', 'shipped')
+        )))
+        self.assertEqual(sorted(row['status'] for row in rows), ['pending', 'shipped'])
+
+    def test_csv_escapes_formulas_and_jsonl_keeps_values(self):
+        rows = {row['first_name']: row for row in csv.DictReader(io.StringIO(self.export()))}
+        self.assertEqual(set(rows), {"'=HYPERLINK(\"http://example.com\")", 'Ada', 'Grace', "'-2+3"})
+        self.assertEqual(rows['Ada']['title'], "'@risk")
+        self.assertEqual(rows['Ada']['price'], '6.00')
+
+        names = {json.loads(line)['first_name'] for line in self.export('--format', 'jsonl').splitlines()}
+        self.assertIn('=HYPERLINK("http://example.com")', names)
+
+    def test_admin_action_streams(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(reverse('admin:bookstore_order_changelist'), {
+            'action': 'export_as_csv', '_selected_action': list(self.orders),
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))), 5)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        self.a, self.b, self.c = [
+            Book.objects.create(
+                title=f'Book {i}', price=Decimal('2.00'), author=author, isbn=f'{i:013d}', stock_quantity=stock,
+            )
+            for i, stock in enumerate([5, 2, 3])
+        ]
+
+    def stock(self):
+        return {book.id: book.stock_quantity for book in Book.objects.all()}
+
+    def place(self, lines):
+        cart = Cart.objects.create(session_key='stock-session')
+        for book, quantity in lines:
+            CartItem.objects.create(cart=cart, book=book, quantity=quantity)
+        return place_order(cart, CUSTOMER).order
+
+    def test_insufficient_stock_rolls_back_every_line(self):
+        before = self.stock()
+        with self.assertRaises(InsufficientStock) as raised:
+            self.place([(self.a, 2), (self.c, 1), (self.b, 3)])
+        self.assertEqual(raised.exception.books, [self.b])
+        self.assertEqual(self.stock(), before)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+
+        with self.assertRaises(InsufficientStock), transaction.atomic():
+            take_stock({self.a.id: 1, self.b.id: 5})
+        self.assertEqual(self.stock(), before)
+
+    def test_commit_is_idempotent(self):
+        order = self.place([(self.a, 2), (self.b, 1)])
+        held = self.stock()
+        self.assertEqual(held[self.a.id], 3)
+
+        self.assertTrue(confirm_order(order))
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+        self.assertEqual(self.stock(), held)
+        units = BookSales.objects.get(book=self.a).units
+
+        self.assertFalse(confirm_order(order))
+        self.assertFalse(commit_order_stock(Order.objects.get(id=order.id)))
+        self.assertEqual(self.stock(), held)
+        self.assertEqual(BookSales.objects.get(book=self.a).units, units)
+
+    def test_expired_reservations_return_stock_once(self):
+        before = self.stock()
+        order = self.place([(self.a, 2), (self.b, 2), (self.c, 1)])
+        self.assertEqual(release_expired_reservations(), 0)
+
+        later = timezone.now() + timedelta(days=1)
+        self.assertEqual(release_expired_reservations(now=later, batch_size=2), 3)
+        self.assertEqual(self.stock(), before)
+        self.assertEqual(release_expired_reservations(now=later), 0)
+        self.assertEqual(self.stock(), before)
+
+        # Paying after expiry takes the stock again
+        self.assertTrue(commit_order_stock(order))
+        self.assertEqual(self.stock(), {self.a.id: 3, self.b.id: 0, self.c.id: 2})
+
+    def test_commit_takes_stock_for_partly_expired_reservations(self):
+        order = self.place([(self.a, 2), (self.b, 1), (self.c, 1)])
+        StockReservation.objects.filter(order=order, book=self.a).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(), {self.a.id: 5, self.b.id: 1, self.c.id: 2})
+
+        self.assertTrue(commit_order_stock(order))
+        self.assertEqual(self.stock(), {self.a.id: 3, self.b.id: 1, self.c.id: 2})
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_purge_stale_releases_stock_before_deleting(self):
+        before = self.stock()
+        stale = self.place([(self.a, 2), (self.b, 1)])
+        paid = self.place([(self.c, 1)])
+        commit_order_stock(paid)
+        recent = self.place([(self.a, 1)])
+        Order.objects.filter(id__in=[stale.id, paid.id]).update(created_at=timezone.now() - timedelta(days=8))
+
+        call_command('purge_stale', stdout=io.StringIO())
+
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {paid.id, recent.id})
+        self.assertEqual(self.stock(), {self.a.id: before[self.a.id] - 1, self.b.id: before[self.b.id],
+                                        self.c.id: before[self.c.id] - 1})
+        self.assertTrue(StockReservation.objects.filter(order=recent).exists())
+
+
+class StockCommittedMigrationTests(TransactionTestCase):
+    before = [('bookstore', '0007_author_category_book_count')]
+    after = [('bookstore', '0008_stock_reservations')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Author = apps.get_model('bookstore', 'Author')
+        Book = apps.get_model('bookstore', 'Book')
+        Order = apps.get_model('bookstore', 'Order')
+        OrderItem = apps.get_model('bookstore', 'OrderItem')
+        book = Book.objects.create(
+            title='Book', price=Decimal('2.00'), author=Author.objects.create(name='Author', bio='Bio'),
+            isbn='0000000000001', stock_quantity=4,
+        )
+        self.order_id = Order.objects.create(total_amount=Decimal('2.00'), **CUSTOMER).id
+        OrderItem.objects.create(order_id=self.order_id, book=book, quantity=1, price=Decimal('2.00'))
+        self.book_id = book.id
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_orders_placed_before_reservations_are_committed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        self.assertTrue(apps.get_model('bookstore', 'Order').objects.get(id=self.order_id).stock_committed)
+
+        # Opening the success page for it must not take its stock again
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        self.assertFalse(commit_order_stock(Order.objects.get(id=self.order_id)))
+        self.assertEqual(Book.objects.get(id=self.book_id).stock_quantity, 4)
+
+
+@override_settings(BOOKSTORE_CART_BACKEND='cookie', BOOKSTORE_QUERY_BUDGET_STRICT=True)
+class CookieCartTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        self.a, self.b, self.c = [
+            Book.objects.create(
+                title=f'Book {i}', price=Decimal('3.00'), author=author, isbn=f'{i:013d}', stock_quantity=stock,
+            )
+            for i, stock in enumerate([5, 5, 2])
+        ]
+
+    def set_cart(self, value):
+        self.client.cookies[COOKIE_NAME] = get_cookie_signer(salt=COOKIE_NAME + COOKIE_SALT).sign(value)
+
+    def cart_lines(self):
+        response = self.client.get(reverse('view_cart'))
+        return {item.book_id: item.quantity for item in response.context['cart_items']}
+
+    def test_anonymous_cart_lives_in_the_cookie(self):
+        self.client.post(reverse('add_to_cart', args=[self.a.id]))
+        self.client.post(reverse('add_to_cart', args=[self.a.id]))
+        self.assertEqual(self.cart_lines(), {self.a.id: 2})
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_tampered_cookie_is_ignored(self):
+        self.set_cart(f'{self.a.id}-1')
+        self.client.cookies[COOKIE_NAME] = self.client.cookies[COOKIE_NAME].value.replace(
+            f'{self.a.id}-1', f'{self.a.id}-4'
+        )
+        self.assertEqual(self.cart_lines(), {})
+        # Signed for something else
+        self.client.cookies[COOKIE_NAME] = get_cookie_signer(salt='other').sign(f'{self.a.id}-1')
+        self.assertEqual(self.cart_lines(), {})
+
+    @override_settings(BOOKSTORE_COOKIE_CART_MAX_LINES=2)
+    def test_oversized_cookie_is_cut_to_the_line_limit(self):
+        self.set_cart('.'.join([f'{self.a.id}-1', f'{self.b.id}-x', f'{self.b.id}-1', 'junk', f'{self.c.id}-1']))
+        self.assertEqual(self.cart_lines(), {self.a.id: 1, self.b.id: 1})
+
+        response = self.client.post(reverse('add_to_cart', args=[self.c.id]), follow=True)
+        self.assertIn('Your cart is full', response.content.decode())
+        self.assertEqual(self.cart_lines(), {self.a.id: 1, self.b.id: 1})
+
+    def test_login_merges_the_cookie_cart(self):
+        user = User.objects.create_user('reader', password='password', is_staff=True)
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, book=self.a, quantity=4)
+        CartItem.objects.create(cart=cart, book=self.b, quantity=1)
+        self.set_cart(f'{self.a.id}-2.{self.b.id}-3.{self.c.id}-9')
+
+        response = self.client.post(reverse('admin:login'), {'username': 'reader', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+        # Larger quantity wins, capped at stock; the cookie is cleared
+        self.assertEqual(
+            dict(cart.items.values_list('book_id', 'quantity')), {self.a.id: 4, self.b.id: 3, self.c.id: 2},
+        )
+        self.assertEqual(response.cookies[COOKIE_NAME].value, '')
+        self.assertEqual(self.cart_lines(), {self.a.id: 4, self.b.id: 3, self.c.id: 2})
+
+
+@override_settings(BOOKSTORE_CART_BACKEND='cookie')
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        self.book = Book.objects.create(
+            title='In Stock', price=Decimal('3.00'), author=author, isbn='0000000000001', stock_quantity=5,
+        )
+        self.sold_out = Book.objects.create(
+            title='Sold Out', price=Decimal('3.00'), author=author, isbn='0000000000002', stock_quantity=0,
+        )
+        self.url = reverse('book_detail', args=[self.book.id])
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def revalidate(self, etag):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_unchanged_page_revalidates_to_304(self):
+        # The first response sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+        etag = self.etag()
+        self.assertEqual(self.revalidate(etag), 304)
+
+        self.book.price = Decimal('4.00')
+        self.book.save()
+        self.assertEqual(self.revalidate(etag), 200)
+
+    def test_etag_follows_cart_user_and_csrf(self):
+        self.client.get(self.url)
+        anonymous = self.etag()
+
+        self.client.post(reverse('add_to_cart', args=[self.book.id]))
+        self.client.get(self.url)  # shows and drops the "added" message
+        with_cart = self.etag()
+        self.assertNotEqual(with_cart, anonymous)
+        self.assertEqual(self.revalidate(anonymous), 200)
+
+        self.client.cookies['csrftoken'] = 'x' * 32
+        with_csrf = self.etag()
+        self.assertNotEqual(with_csrf, with_cart)
+
+        self.client.force_login(User.objects.create_user('reader'))
+        self.client.get(self.url)
+        self.assertNotIn(self.etag(), (anonymous, with_cart, with_csrf))
+
+    def test_queued_messages_suppress_304(self):
+        self.client.get(self.url)
+        etag = self.etag()
+        # Refused without touching the cart, so only the message changes
+        self.client.post(reverse('add_to_cart', args=[self.sold_out.id]))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Sold Out is out of stock')
+        self.assertEqual(self.revalidate(etag), 304)
+
+    def test_cache_control_is_private_once_logged_in(self):
+        response = self.client.get(self.url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+        self.client.force_login(User.objects.create_user('reader'))
+        response = self.client.get(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])['Cache-Control'],
+                         response['Cache-Control'])
+
+
+class ImportCatalogTests(TestCase):
+    def run_import(self, name, content, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, name)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            out = io.StringIO()
+            call_command('import_catalog', path, *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue().strip().splitlines()[-1]
+
+    def test_csv_import(self):
+        summary = self.run_import('catalog.csv', (
+            'title,author,isbn,price,stock_quantity,publication_date,categories\n'
+            'First Book,Ada Writer,978-0000000001,12.50,4,2020-01-31,Fiction|Poetry\n'
+            'Second Book,Ada Writer,9780000000002,3,0,,Fiction\n'
+        ))
+
+        self.assertTrue(summary.startswith('Imported 2 books, skipped 0 duplicates and 0 invalid rows'))
+        book = Book.objects.get(isbn='9780000000001')
+        self.assertEqual((book.title, book.price, book.stock_quantity), ('First Book', Decimal('12.50'), 4))
+        self.assertEqual(book.publication_date, date(2020, 1, 31))
+        self.assertEqual(sorted(book.categories.values_list('name', flat=True)), ['Fiction', 'Poetry'])
+        author = Author.objects.get(name='Ada Writer')
+        self.assertEqual(author.book_count, 2)
+        self.assertEqual(Category.objects.get(name='Fiction').book_count, 2)
+        self.assertEqual(list(get_search_backend().search(Book.objects.all(), 'poetry')), [book])
+
+    def test_jsonl_import(self):
+        summary = self.run_import('catalog.jsonl', '\n'.join([
+            '{"title": "Json Book", "author": "Bo Coder", "isbn": 9780000000003, "price": 7.5,'
+            ' "categories": ["Science", " "]}',
+            '',
+            '{"title": "Other Book", "author": "Bo Coder", "isbn": "9780000000004", "categories": "Science|Maths"}',
+        ]))
+
+        self.assertTrue(summary.startswith('Imported 2 books, skipped 0 duplicates and 0 invalid rows'))
+        book = Book.objects.get(isbn='9780000000003')
+        self.assertEqual(book.price, Decimal('7.50'))
+        self.assertEqual(list(book.categories.values_list('name', flat=True)), ['Science'])
+        self.assertEqual(Category.objects.get(name='Science').book_count, 2)
+
+    def test_duplicate_isbns_are_skipped(self):
+        Book.objects.create(
+            title='Existing', price=Decimal('1.00'), author=Author.objects.create(name='Author', bio='Bio'),
+            isbn='9780000000005', stock_quantity=1,
+        )
+        summary = self.run_import('catalog.csv', (
+            'title,author,isbn\n'
+            'Existing Again,Author,9780000000005\n'
+            'New,Author,9780000000006\n'
+            'New Again,Author,978-0000000006\n'
+            'In Next Batch,Author,9780000000006\n'
+        ), '--batch-size', '3')
+
+        self.assertTrue(summary.startswith('Imported 1 books, skipped 3 duplicates and 0 invalid rows'))
+        self.assertEqual(Book.objects.get(isbn='9780000000005').title, 'Existing')
+        self.assertEqual(Book.objects.get(isbn='9780000000006').title, 'New')
+
+    def test_invalid_rows_are_counted_not_fatal(self):
+        summary = self.run_import('catalog.jsonl', '\n'.join([
+            '{"title": "Good", "author": "Author", "isbn": "9780000000007", "price": "4.99"}',
+            'not json',
+            '[1, 2]',
+            '"x"',
+            '{"title": ["a"], "author": {"name": "b"}, "isbn": "9780000000008"}',
+            '{"title": "No Isbn", "author": "Author"}',
+            '{"title": "Nan", "author": "Author", "isbn": "9780000000009", "price": "NaN"}',
+            '{"title": "Inf", "author": "Author", "isbn": "9780000000010", "price": "Infinity"}',
+            '{"title": "Huge", "author": "Author", "isbn": "9780000000011", "price": "1e20"}',
+            '{"title": "Cents", "author": "Author", "isbn": "9780000000012", "price": "1.005"}',
+            '{"title": "Bad Stock", "author": "Author", "isbn": "9780000000013", "stock_quantity": [1]}',
+            '{"title": "Bad Date", "author": "Author", "isbn": "9780000000014", "publication_date": "soon"}',
+        ]))
+
+        self.assertTrue(summary.startswith('Imported 2 books, skipped 0 duplicates and 10 invalid rows'))
+        # Non-string fields are coerced rather than crashing the import
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Good', "['a']"])
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, MEDIA_URL='/media/'))
+        self.author = Author.objects.create(name='Author', bio='Bio')
+
+    def book(self, filename, content):
+        book = Book.objects.create(
+            title=filename, price=Decimal('1.00'), author=self.author,
+            isbn=f'{Book.objects.count():013d}', stock_quantity=1,
+        )
+        book.cover_image.save(filename, ContentFile(content))
+        return book
+
+    def image(self, color, fmt):
+        output = io.BytesIO()
+        Image.new('RGB', (600, 300), color).save(output, fmt)
+        return output.getvalue()
+
+    def test_sources_differing_by_extension_get_their_own_thumbnails(self):
+        png = self.book('cover.png', self.image('red', 'PNG'))
+        jpg = self.book('cover.jpg', self.image('blue', 'JPEG'))
+        self.assertEqual(png.cover_image.name, 'books/covers/cover.png')
+        self.assertEqual(jpg.cover_image.name, 'books/covers/cover.jpg')
+
+        self.assertEqual(png.cover_thumbnail, '/media/books/covers/thumbs/cover.png_400x400.jpeg')
+        self.assertEqual(jpg.cover_thumbnail, '/media/books/covers/thumbs/cover.jpg_400x400.jpeg')
+        for book, color in ((png, (255, 0, 0)), (jpg, (0, 0, 255))):
+            name = thumbnail_name(book.cover_image.name, 'card', 'jpeg')
+            with default_storage.open(name) as f, Image.open(f) as thumb:
+                self.assertEqual(thumb.size, (400, 200))
+                self.assertLess(max(abs(a - b) for a, b in zip(thumb.getpixel((200, 100)), color)), 10)
+
+    def test_broken_image_falls_back_to_the_original_once(self):
+        book = self.book('broken.png', b'not an image')
+        self.assertEqual(book.cover_thumbnail, '/media/books/covers/broken.png')
+
+        with mock.patch('bookstore.thumbnails.generate_thumbnail') as generate:
+            self.assertEqual(book.cover_thumbnail, '/media/books/covers/broken.png')
+        generate.assert_not_called()
+
+
+class BookCountTests(TestCase):
+    def setUp(self):
+        self.austen = Author.objects.create(name='Austen', bio='Bio')
+        self.bronte = Author.objects.create(name='Bronte', bio='Bio')
+        self.fiction = Category.objects.create(name='Fiction')
+        self.classics = Category.objects.create(name='Classics')
+        self.books = [
+            Book.objects.create(
+                title=f'Book {i}', price=Decimal('3.00'), author=self.austen, isbn=f'{i:013d}', stock_quantity=1,
+            )
+            for i in range(3)
+        ]
+
+    def counts(self):
+        return (
+            dict(Author.objects.values_list('name', 'book_count')),
+            dict(Category.objects.values_list('name', 'book_count')),
+        )
+
+    def test_author_counts_follow_saves_and_deletes(self):
+        self.assertEqual(self.counts()[0], {'Austen': 3, 'Bronte': 0})
+        book = self.books[0]
+        book.author = self.bronte
+        book.save()
+        self.assertEqual(self.counts()[0], {'Austen': 2, 'Bronte': 1})
+
+        # A partial load never read author_id
+        book = Book.objects.only('id', 'title').get(id=self.books[1].id)
+        book.author = self.bronte
+        book.save()
+        self.assertEqual(self.counts()[0], {'Austen': 1, 'Bronte': 2})
+
+        book = Book.objects.defer('author').get(id=self.books[2].id)
+        book.title = 'Renamed'
+        book.save(update_fields=['title'])
+        self.assertEqual(self.counts()[0], {'Austen': 1, 'Bronte': 2})
+
+        Book.objects.get(id=self.books[0].id).delete()
+        self.assertEqual(self.counts()[0], {'Austen': 1, 'Bronte': 1})
+
+    def test_category_counts_follow_links(self):
+        a, b, c = self.books
+        a.categories.add(self.fiction, self.classics)
+        self.fiction.books.add(b, c)
+        self.assertEqual(self.counts()[1], {'Fiction': 3, 'Classics': 1})
+
+        # Removing a link that doesn't exist changes nothing
+        b.categories.remove(self.classics)
+        self.fiction.books.remove(a)
+        self.assertEqual(self.counts()[1], {'Fiction': 2, 'Classics': 1})
+        a.categories.clear()
+        self.assertEqual(self.counts()[1], {'Fiction': 2, 'Classics': 0})
+        c.delete()
+        self.assertEqual(self.counts()[1], {'Fiction': 1, 'Classics': 0})
+        self.fiction.books.clear()
+        self.assertEqual(self.counts()[1], {'Fiction': 0, 'Classics': 0})
+
+    def test_recount_books_repairs_drift(self):
+        self.books[0].categories.add(self.fiction)
+        expected = self.counts()
+        Author.objects.update(book_count=7)
+        Category.objects.update(book_count=5)
+
+        self.assertEqual(recount_books(author_ids=[self.austen.id], category_ids=[]), (1, 0))
+        self.assertEqual(self.counts(), ({'Austen': 3, 'Bronte': 7}, {'Fiction': 5, 'Classics': 5}))
+        self.assertEqual(recount_books(), (2, 2))
+        self.assertEqual(self.counts(), expected)
+
+
+class MediaDeliveryTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, BOOKSTORE_MEDIA_DELIVERY='django'))
+        os.makedirs(os.path.join(media.name, 'books', 'covers'))
+        self.data = bytes(range(256)) * 800
+        with open(os.path.join(media.name, 'books', 'covers', 'cover.png'), 'wb') as f:
+            f.write(self.data)
+        self.url = '/media/books/covers/cover.png'
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_byte_ranges(self):
+        size = len(self.data)
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=204700-', 204700, size - 1),
+            ('bytes=0-999999', 0, size - 1),
+            ('bytes=-100', size - 100, size - 1),
+            ('bytes=-999999', 0, size - 1),
+        ):
+            with self.subTest(header):
+                response, body = self.get(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, self.data[start:end + 1])
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(response['Content-Type'], 'image/png')
+
+        # Ranges that can't apply send the whole file
+        for headers in ({'Range': 'bytes=0-1,5-9'}, {'Range': 'bytes=0-9', 'If-Range': '"stale"'}):
+            response, body = self.get(**headers)
+            self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=204800-', 'bytes=-0', 'bytes=20-10'):
+            with self.subTest(header):
+                response, _ = self.get(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */204800')
+                self.assertNotIn('Cache-Control', response)
+
+    def test_paths_outside_media_root(self):
+        for path in ('../manage.py', '/etc/passwd', 'books/../../manage.py', 'books/covers'):
+            with self.subTest(path):
+                with self.assertRaises(Http404):
+                    serve_media(RequestFactory().get('/media/'), path)
+        self.assertEqual(self.client.get('/media/books/covers/missing.png').status_code, 404)
+
+    async def test_ranges_stream_under_asgi(self):
+        response = await AsyncClient().get(self.url, headers={'Range': 'bytes=100-200099'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), self.data[100:200100])
+
+    def test_ranges_are_offloaded_with_the_whole_file(self):
+        with self.settings(BOOKSTORE_MEDIA_DELIVERY='x-accel-redirect'):
+            response = self.client.get(self.url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/books/covers/cover.png')
+        self.assertEqual(response.content, b'')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        # Repeated titles so pages break inside a run of equal sort keys
+        for i, title in enumerate(['Beta', 'Alpha', 'Beta', 'Gamma', 'Alpha', 'Beta', 'Delta']):
+            Book.objects.create(title=title, price=Decimal('1.00'), author=author, isbn=f'{i:013d}', stock_quantity=1)
+        self.ordered = list(Book.objects.order_by('title', 'id').values_list('id', flat=True))
+        self.paginator = KeysetPaginator(Book.objects.all(), ('title', 'id'), per_page=3)
+
+    def ids(self, page):
+        return [book.id for book in page]
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_cursors_walk_every_page_both_ways(self):
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([self.ids(page) for page in pages],
+                         [self.ordered[:3], self.ordered[3:6], self.ordered[6:]])
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[-1].has_previous)
+
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(self.paginator.get_page(back[-1].previous_cursor))
+        self.assertEqual([self.ids(page) for page in reversed(back)], [self.ids(page) for page in pages])
+        self.assertTrue(back[-1].has_next)
+
+    def test_descending_ordering_with_equal_keys(self):
+        created = timezone.now()
+        for _ in range(5):
+            Order.objects.create(total_amount=Decimal('1.00'), **CUSTOMER)
+        Order.objects.update(created_at=created)
+        paginator = KeysetPaginator(Order.objects.all(), ('-created_at', '-id'), per_page=2)
+        ids, page = [], paginator.get_page()
+        ids += self.ids(page)
+        while page.has_next:
+            page = paginator.get_page(page.next_cursor)
+            ids += self.ids(page)
+        self.assertEqual(ids, sorted(Order.objects.values_list('id', flat=True), reverse=True))
+
+    def test_tampered_cursors_start_from_the_first_page(self):
+        first = self.ids(self.paginator.get_page())
+        for cursor in (
+            'not a cursor',
+            '!!!!',
+            self.cursor('next'),
+            self.cursor(['sideways', ['Alpha', 1]]),
+            self.cursor(['next', ['Alpha']]),
+            self.cursor(['next', ['Alpha', 'x']]),
+            self.cursor(['next', ['Alpha', None]]),
+            self.cursor({'next': ['Alpha', 1]}),
+        ):
+            with self.subTest(cursor):
+                self.assertEqual(self.ids(self.paginator.get_page(cursor)), first)
+                self.assertEqual([book.id for book in self.paginator.stream_page(cursor)], first)
+
+        orders = KeysetPaginator(Order.objects.all(), ('-created_at', '-id'))
+        self.assertEqual(list(orders.get_page(self.cursor(['next', ['yesterday', 1]]))), [])
+
+    def test_stream_page_reads_forward_only(self):
+        page = self.paginator.get_page(self.paginator.get_page().next_cursor)
+        stream = self.paginator.stream_page(page.previous_cursor)
+        self.assertIsNone(stream.next_cursor)
+        self.assertEqual([book.id for book in stream], self.ordered[:3])
+        self.assertEqual(stream.next_cursor, self.paginator.get_page().next_cursor)
+
+    def test_book_list_follows_cursors_and_ignores_bad_ones(self):
+        url = reverse('book_list')
+        with self.settings(BOOKSTORE_PAGE_SIZE=4):
+            first = self.client.get(url, {'format': 'json'}).json()
+            second = self.client.get(url, {'format': 'json', 'cursor': first['next']}).json()
+            back = self.client.get(url, {'format': 'json', 'cursor': second['previous']}).json()
+            bad = self.client.get(url, {'format': 'json', 'cursor': self.cursor(['next', ['Alpha', 'x']])})
+        self.assertEqual([book['id'] for book in first['results'] + second['results']], self.ordered)
+        self.assertIsNone(second['next'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertEqual(bad.status_code, 200)
+        self.assertEqual(bad.json()['results'], first['results'])
+
+
+class OrderDashboardTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True))
+        self.book = Book.objects.create(
+            title='Book', price=Decimal('5.00'), author=Author.objects.create(name='Author', bio='Bio'),
+            isbn='0000000000001', stock_quantity=50,
+        )
+        self.orders = [self.make_order(status) for status in ('pending', 'pending', 'shipped', 'cancelled')]
+        self.url = reverse('order_management')
+
+    def make_order(self, status='pending'):
+        order = Order.objects.create(total_amount=Decimal('5.00'), status=status, stock_committed=True, **CUSTOMER)
+        OrderItem.objects.create(order=order, book=self.book, quantity=1, price=self.book.price)
+        sync_sales([order.id])
+        return order
+
+    def update(self, data, order=None):
+        url = reverse('update_order_status', args=[order.id]) if order else reverse('update_order_status')
+        response = self.client.post(url, data, follow=True)
+        self.assertRedirects(response, self.url)
+        return [str(message) for message in response.context['messages']]
+
+    def statuses(self):
+        return [Order.objects.get(id=order.id).status for order in self.orders]
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(User.objects.create_user('reader'))
+        response = self.client.post(reverse('update_order_status'), {'order_ids': [self.orders[0].id], 'status': 'shipped'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.statuses(), ['pending', 'pending', 'shipped', 'cancelled'])
+
+    def test_dashboard_summary_and_filter(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        counts = {row['value']: row['count'] for row in response.context['status_rows']}
+        self.assertEqual(counts, {'pending': 2, 'processing': 0, 'shipped': 1, 'delivered': 0, 'cancelled': 1})
+        self.assertEqual(response.context['total_orders'], 4)
+        self.assertEqual(response.context['total_revenue'], Decimal('15.00'))
+
+        response = self.client.get(self.url, {'status': 'pending'})
+        self.assertEqual([order.id for order in response.context['orders']], [self.orders[1].id, self.orders[0].id])
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        for _ in range(20):
+            self.make_order()
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.url)
+        self.assertEqual(len(many), len(few))
+
+    def test_bulk_status_update(self):
+        pending, other, shipped, cancelled = self.orders
+        messages = self.update({'order_ids': [pending.id, other.id, shipped.id], 'status': 'shipped'})
+        self.assertEqual(messages, ['2 orders updated to Shipped'])
+        self.assertEqual(self.statuses(), ['shipped', 'shipped', 'shipped', 'cancelled'])
+
+        # Cancelling takes the orders back out of the sales rollups
+        self.assertEqual(BookSales.objects.get(book=self.book).units, 3)
+        self.assertEqual(self.update({'order_ids': [pending.id, other.id], 'status': 'cancelled'}),
+                         ['2 orders updated to Cancelled'])
+        self.assertEqual(BookSales.objects.get(book=self.book).units, 1)
+
+        self.assertEqual(self.update({'status': 'delivered'}, order=shipped), ['1 order updated to Delivered'])
+        self.assertEqual(self.statuses(), ['cancelled', 'cancelled', 'delivered', 'cancelled'])
+
+    def test_empty_or_invalid_selection_changes_nothing(self):
+        error = ['Please choose a valid status and at least one order.']
+        for data in (
+            {'status': 'shipped'},
+            {'order_ids': [], 'status': 'shipped'},
+            {'order_ids': [self.orders[0].id], 'status': 'lost'},
+            {'order_ids': [self.orders[0].id]},
+            {'order_ids': ['first'], 'status': 'shipped'},
+        ):
+            with self.subTest(data):
+                self.assertEqual(self.update(data), error)
+        self.assertEqual(self.statuses(), ['pending', 'pending', 'shipped', 'cancelled'])
+
+
+class BenchServersCommandTests(TestCase):
+    def run_command(self, *args):
+        result = {'requests': 10, 'rps': 5.0, 'p50_ms': 1.0, 'p95_ms': 2.0, 'errors': 0}
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch('bookstore.management.commands.bench_servers.subprocess.Popen') as popen, \
+                mock.patch('bookstore.management.commands.bench_servers.Command.wait_until_ready'), \
+                mock.patch('bookstore.management.commands.bench_servers.Command.load', return_value=result) as load:
+            call_command('bench_servers', *args, stdout=out, stderr=err)
+        return popen, load, out.getvalue(), err.getvalue()
+
+    def test_servers_workers_and_paths(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            popen, load, out, _ = self.run_command(
+                '--servers', 'wsgi', 'asgi-sync', '--workers', '3', '--concurrency', '4', '--duration', '0.5',
+                '--path', '/a/', '--path', '/b/', '--output', output,
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        (wsgi, wsgi_kwargs), (asgi, asgi_kwargs) = [(call.args[0], call.kwargs) for call in popen.call_args_list]
+        self.assertIn('gunicorn', wsgi)
+        self.assertEqual(wsgi[wsgi.index('--workers') + 1], '3')
+        self.assertIn('uvicorn', asgi)
+        self.assertEqual(asgi[asgi.index('--workers') + 1], '3')
+        # The sync views under uvicorn
+        self.assertEqual(wsgi_kwargs['env']['BOOKSTORE_ASYNC_VIEWS'], '0')
+        self.assertEqual(asgi_kwargs['env']['BOOKSTORE_ASYNC_VIEWS'], '0')
+        self.assertEqual([call.args[1] for call in load.call_args_list], ['/a/', '/b/', '/a/', '/b/'])
+
+        self.assertEqual(report['options'], {'workers': 3, 'concurrency': 4, 'duration': 0.5})
+        self.assertEqual(list(report['servers']), ['wsgi', 'asgi-sync'])
+        self.assertEqual(list(report['servers']['wsgi']), ['/a/', '/b/'])
+        self.assertIn('asgi-sync rps', out)
+
+    def test_default_servers_and_paths_come_from_the_catalog(self):
+        popen, load, out, err = self.run_command('--duration', '0')
+        self.assertIn('seed it first', err)
+        self.assertEqual([call.kwargs['env']['BOOKSTORE_ASYNC_VIEWS'] for call in popen.call_args_list], ['0', '1'])
+        self.assertIn('asgi/wsgi', out)
+
+        author = Author.objects.create(name='Author', bio='Bio')
+        book = Book.objects.create(title='Book', price=Decimal('1.00'), author=author, isbn='0000000000001')
+        category = Category.objects.create(name='Fiction')
+        book.categories.add(category)
+        _, load, _, err = self.run_command('--servers', 'asgi', '--duration', '0')
+        self.assertEqual(err, '')
+        self.assertEqual(
+            [call.args[1] for call in load.call_args_list],
+            ['/', '/?search=the', '/authors/', '/categories/', '/track-order/',
+             f'/book/{book.id}/', f'/author/{author.id}/', f'/category/{category.id}/'],
+        )
+
+    def test_bad_arguments(self):
+        for args in (['--servers', 'daphne'], ['--workers', 'two'], ['--duration']):
+            with self.subTest(args), self.assertRaises(CommandError):
+                call_command('bench_servers', *args)
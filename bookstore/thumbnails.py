@@ -0,0 +1,102 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Bounding boxes; thumbnails keep the original aspect ratio
+THUMBNAIL_SIZES = {
+    'small': (100, 100),
+    'avatar': (300, 300),
+    'card': (400, 400),
+    'detail': (800, 800),
+}
+
+# Sizes pre-generated on upload for each kind of image
+COVER_SIZES = ('small', 'card', 'detail')
+PHOTO_SIZES = ('small', 'avatar')
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _cache_key(name, size, fmt):
+    # v2: names keep the source extension, so v1 URLs may point at another image
+    return f'bookstore:thumb:v2:{name}:{size}:{fmt}'
+
+
+def thumbnail_name(name, size, fmt):
+    """books/covers/x.png -> books/covers/thumbs/x.png_400x400.webp"""
+    directory, filename = os.path.split(name)
+    width, height = THUMBNAIL_SIZES[size]
+    # The whole filename, so x.png and x.jpg get different derivatives
+    return os.path.join(directory, 'thumbs', f'{filename}_{width}x{height}.{fmt}')
+
+
+def render_thumbnail(source, size, fmt):
+    """Resize an open image file and return the encoded bytes"""
+    pil_format, options = THUMBNAIL_FORMATS[fmt]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        image.thumbnail(THUMBNAIL_SIZES[size], Image.Resampling.LANCZOS)
+        output = BytesIO()
+        image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def generate_thumbnail(field_file, size, fmt, force=False):
+    """Write one derivative next to the original and return its storage name"""
+    storage = field_file.storage
+    name = thumbnail_name(field_file.name, size, fmt)
+    if storage.exists(name):
+        if not force:
+            return name
+        storage.delete(name)
+    with storage.open(field_file.name, 'rb') as source:
+        data = render_thumbnail(source, size, fmt)
+    saved = storage.save(name, ContentFile(data))
+    cache.set(_cache_key(field_file.name, size, fmt), storage.url(saved), _timeout())
+    return saved
+
+
+def generate_all(field_file, sizes=THUMBNAIL_SIZES, force=False):
+    """Generate the given sizes in every format; returns the count written"""
+    if not field_file:
+        return 0
+    count = 0
+    for size in sizes:
+        for fmt in THUMBNAIL_FORMATS:
+            generate_thumbnail(field_file, size, fmt, force=force)
+            count += 1
+    return count
+
+
+def thumbnail_url(field_file, size='card', fmt='jpeg'):
+    """
+    URL of a derivative, generated on first request and cached afterwards.
+    Falls back to the original when the source cannot be read; the fallback
+    is cached too, so a broken image is not reopened on every request.
+    """
+    if not field_file:
+        return ''
+    key = _cache_key(field_file.name, size, fmt)
+    url = cache.get(key)
+    if url is None:
+        try:
+            url = field_file.storage.url(generate_thumbnail(field_file, size, fmt))
+        except (OSError, UnidentifiedImageError):
+            url = field_file.url
+        cache.set(key, url, _timeout())
+    return url
+
+
+def _timeout():
+    return getattr(settings, 'BOOKSTORE_THUMBNAIL_CACHE_TIMEOUT', 60 * 60 * 24)
@@ -1,14 +1,18 @@
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Read-only catalog views; the async versions are meant for ASGI deployments
+catalog = async_views if getattr(settings, 'BOOKSTORE_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('', views.book_list, name='book_list'),
-    path('authors/', views.author_list, name='author_list'),  
-    path('categories/', views.category_list, name='category_list'), 
-    path('book/<int:book_id>/', views.book_detail, name='book_detail'),
-    path('author/<int:author_id>/', views.author_detail, name='author_detail'),
-    path('category/<int:category_id>/', views.category_detail, name='category_detail'),
+    path('', catalog.book_list, name='book_list'),
+    path('authors/', catalog.author_list, name='author_list'),  
+    path('categories/', catalog.category_list, name='category_list'), 
+    path('book/<int:book_id>/', catalog.book_detail, name='book_detail'),
+    path('author/<int:author_id>/', catalog.author_detail, name='author_detail'),
+    path('category/<int:category_id>/', catalog.category_detail, name='category_detail'),
     
     path('add-to-cart/<int:book_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.view_cart, name='view_cart'),
@@ -18,6 +22,16 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
     path('payment/<int:order_id>/', views.payment, name='payment'),
     path('order-success/<int:order_id>/', views.order_success, name='order_success'),
-    path('track-order/', views.track_order, name='track_order'),
+    path('track-order/', catalog.track_order, name='track_order'),
+
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('api/books/', api.book_list, name='api_book_list'),
+    path('api/authors/', api.author_list, name='api_author_list'),
+    path('api/categories/', api.category_list, name='api_category_list'),
+
+    path('staff/orders/', views.order_management, name='order_management'),
+    path('staff/orders/status/', views.update_order_status, name='update_order_status'),
+    path('staff/orders/<int:order_id>/status/', views.update_order_status, name='update_order_status'),
+    path('staff/sales/', views.sales_report, name='sales_report'),
 ]
 
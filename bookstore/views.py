@@ -1,23 +1,66 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib import messages
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.views.decorators.http import require_POST
-from .models import Author, Book, Category, Cart, CartItem, OrderItem, Order
-from django.contrib.auth.decorators import login_required
+from .models import Author, Book, BookSales, Category, CategorySales, Cart, CartItem, Order
+from .conditional import (
+    author_detail_modified, book_detail_modified, book_list_modified, category_detail_modified, conditional_page,
+)
+from .facets import catalog_facets
+from .autocomplete import get_index as get_autocomplete_index
+from .cart import cart_totals, get_cookie_cart, invalidate_cart_count, materialize_cart, uses_cookie_cart
+from .inventory import InsufficientStock
+from .orders import EmptyCart, confirm_order, place_order, set_order_status, status_summary
+from .pagination import KeysetPaginator
+from .recommendations import recommendations_for
+from .sales import daily_sales
+from .search import get_search_backend
 from django.contrib.admin.views.decorators import staff_member_required
 
+BOOK_ORDERING = ('title', 'id')
+
+
+def wants_json(request):
+    return request.GET.get('format') == 'json'
+
+
+def book_to_json(book):
+    return {
+        'id': book.id,
+        'title': book.title,
+        'price': str(book.price),
+        'isbn': book.isbn,
+        'stock_quantity': book.stock_quantity,
+        'author': {'id': book.author_id, 'name': book.author.name},
+        'categories': [category.name for category in book.categories.all()],
+    }
+
+
+def page_to_json(page):
+    return JsonResponse({
+        'results': [book_to_json(book) for book in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def facet_groups(facets, selected_category, selected_author):
+    """(parameter, label, selected id, entries, name search URL) per sidebar facet"""
+    return [
+        ('author', 'Author', selected_author, facets['authors'], reverse('api_author_list')),
+        ('category', 'Category', selected_category, facets['categories'], reverse('api_category_list')),
+    ]
+
+
+@conditional_page(book_list_modified)
 def book_list(request):
     books = Book.objects.select_related('author').prefetch_related('categories')
-    categories = Category.objects.all()
-    authors = Author.objects.all()
 
-    search_query = request.GET.get('search', '')
+    search_query = request.GET.get('search', '').strip()
     if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) | 
-            Q(author__name__icontains=search_query)
-        )
+        books = get_search_backend().search(books, search_query)
 
     category_filter = request.GET.get('category', '')
     if category_filter:
@@ -26,43 +69,83 @@ def book_list(request):
     author_filter = request.GET.get('author', '')
     if author_filter:
         books = books.filter(author__id=author_filter)
+
+    ordering = ('search_rank', 'id') if search_query else BOOK_ORDERING
+    page = KeysetPaginator(books, ordering).get_page(request.GET.get('cursor'))
+    if wants_json(request):
+        return page_to_json(page)
     
+    facets = catalog_facets(search_query, category_filter, author_filter)
     context = {
-        'books': books,
-        'categories': categories,
-        'authors': authors,
+        'books': page.object_list,
+        'page': page,
+        'categories': facets['categories'],
+        'authors': facets['authors'],
+        'facet_groups': facet_groups(facets, category_filter, author_filter),
         'search_query': search_query,
         'selected_category': category_filter,
         'selected_author': author_filter,
     }
     return render(request, 'bookstore/book_list.html', context)
 
+def autocomplete(request):
+    """Search-as-you-type suggestions from the in-process index; no SQL"""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 8)), 20))
+    except ValueError:
+        limit = 8
+    results = []
+    for kind, id, label, isbn in get_autocomplete_index().lookup(request.GET.get('q', ''), limit):
+        results.append({
+            'type': kind,
+            'id': id,
+            'label': label,
+            'isbn': isbn,
+            'url': reverse('book_detail' if kind == 'book' else 'author_detail', args=[id]),
+        })
+    response = JsonResponse({'results': results})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+@conditional_page(author_detail_modified)
 def author_detail(request, author_id):
     author = get_object_or_404(Author, id=author_id)
-    books = author.books.all()
+    books = author.books.select_related('author').prefetch_related('categories')
+    page = KeysetPaginator(books, BOOK_ORDERING).get_page(request.GET.get('cursor'))
+    if wants_json(request):
+        return page_to_json(page)
     return render(request, 'bookstore/author_detail.html', {
         'author': author,
-        'books': books
+        'books': page.object_list,
+        'page': page,
     })
 
+@conditional_page(category_detail_modified)
 def category_detail(request, category_id):
     category = get_object_or_404(Category, id=category_id)
-    books = category.books.all()
+    books = category.books.select_related('author').prefetch_related('categories')
+    page = KeysetPaginator(books, BOOK_ORDERING).get_page(request.GET.get('cursor'))
+    if wants_json(request):
+        return page_to_json(page)
     return render(request, 'bookstore/category_detail.html', {
         'category': category,
-        'books': books
+        'books': page.object_list,
+        'page': page,
     })
 
+@conditional_page(book_detail_modified)
 def book_detail(request, book_id):
     book = get_object_or_404(Book, id=book_id)
     return render(request, 'bookstore/book_detail.html', {
-        'book': book
+        'book': book,
+        'recommendations': recommendations_for(book),
     })
 
 def author_list(request):
-    authors = Author.objects.all().order_by('name')
+    page = KeysetPaginator(Author.objects.all(), ('name', 'id')).get_page(request.GET.get('cursor'))
     return render(request, 'bookstore/author_list.html', {
-        'authors': authors
+        'authors': page.object_list,
+        'page': page,
     })
 
 def category_list(request):
@@ -87,6 +170,8 @@ def get_or_create_cart(request):
 def add_to_cart(request, book_id):
     """Add book to cart"""
     book = get_object_or_404(Book, id=book_id)
+    if uses_cookie_cart(request):
+        return add_to_cookie_cart(request, book)
     cart = get_or_create_cart(request)
 
     if book.stock_quantity <= 0:
@@ -98,6 +183,8 @@ def add_to_cart(request, book_id):
         book=book,
         defaults={'quantity': 1}
     )
+    if created:
+        invalidate_cart_count(cart)
     
     if not created:
         if cart_item.quantity + 1 > book.stock_quantity:
@@ -111,22 +198,46 @@ def add_to_cart(request, book_id):
     
     return redirect('book_list')
 
+def add_to_cookie_cart(request, book):
+    """add_to_cart for anonymous visitors on the cookie backend"""
+    cart = get_cookie_cart(request)
+    quantity = cart.quantity(book.id)
+    if book.stock_quantity <= 0:
+        messages.error(request, f"{book.title} is out of stock!")
+    elif quantity + 1 > book.stock_quantity:
+        messages.warning(request, f"Cannot add more {book.title}. Only {book.stock_quantity} in stock!")
+    elif not cart.set(book.id, quantity + 1):
+        messages.warning(request, "Your cart is full. Please check out or remove some books first.")
+    elif quantity:
+        messages.success(request, f"Added another {book.title} to cart!")
+    else:
+        messages.success(request, f"{book.title} added to cart!")
+    return redirect('book_list')
+
 def view_cart(request):
     """Display cart contents"""
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    if uses_cookie_cart(request):
+        cart, cart_items = None, get_cookie_cart(request).items()
+    else:
+        cart = get_or_create_cart(request)
+        cart_items = list(cart.items.select_related('book__author'))
+    total_items, total_price = cart_totals(cart_items)
     
     context = {
         'cart': cart,
         'cart_items': cart_items,
+        'total_items': total_items,
+        'total_price': total_price,
     }
     return render(request, 'bookstore/cart.html', context)
 
 @require_POST
 def update_cart(request, item_id):
     """Update cart item quantity"""
-    cart_item = get_object_or_404(CartItem, id=item_id)
     quantity = int(request.POST.get('quantity', 1))
+    if uses_cookie_cart(request):
+        return update_cookie_cart(request, item_id, quantity)
+    cart_item = get_object_or_404(CartItem.objects.select_related('cart', 'book'), id=item_id)
     
     if quantity > 0:
         if quantity <= cart_item.book.stock_quantity:
@@ -137,60 +248,82 @@ def update_cart(request, item_id):
             messages.error(request, f"Only {cart_item.book.stock_quantity} {cart_item.book.title} in stock!")
     else:
         cart_item.delete()
+        invalidate_cart_count(cart_item.cart)
         messages.success(request, f"Removed {cart_item.book.title} from cart!")
     
     return redirect('view_cart')
 
+def update_cookie_cart(request, book_id, quantity):
+    """update_cart for the cookie backend, where item ids are book ids"""
+    cart = get_cookie_cart(request)
+    if not cart.quantity(book_id):
+        raise Http404("No such cart item")
+    book = get_object_or_404(Book, id=book_id)
+    if quantity > 0:
+        if quantity <= book.stock_quantity:
+            cart.set(book.id, quantity)
+            messages.success(request, f"Updated {book.title} quantity!")
+        else:
+            messages.error(request, f"Only {book.stock_quantity} {book.title} in stock!")
+    else:
+        cart.remove(book.id)
+        messages.success(request, f"Removed {book.title} from cart!")
+    return redirect('view_cart')
+
 @require_POST
 def remove_from_cart(request, item_id):
     """Remove item from cart"""
-    cart_item = get_object_or_404(CartItem, id=item_id)
+    if uses_cookie_cart(request):
+        return update_cookie_cart(request, item_id, 0)
+    cart_item = get_object_or_404(CartItem.objects.select_related('cart', 'book'), id=item_id)
     book_title = cart_item.book.title
     cart_item.delete()
+    invalidate_cart_count(cart_item.cart)
     messages.success(request, f"Removed {book_title} from cart!")
     return redirect('view_cart')
 
 def checkout(request):
     """Checkout process - collect shipping info"""
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    if uses_cookie_cart(request):
+        cart, cart_items = None, get_cookie_cart(request).items(Book.objects.all())
+    else:
+        cart = get_or_create_cart(request)
+        cart_items = list(cart.items.select_related('book'))
     
     if not cart_items:
         messages.warning(request, "Your cart is empty!")
         return redirect('book_list')
     
     if request.method == 'POST':
-        order = Order.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            session_key=request.session.session_key if not request.user.is_authenticated else None,
-            email=request.POST.get('email'),
-            first_name=request.POST.get('first_name'),
-            last_name=request.POST.get('last_name'),
-            phone=request.POST.get('phone'),
-            address=request.POST.get('address'),
-            city=request.POST.get('city'),
-            postal_code=request.POST.get('postal_code'),
-            country=request.POST.get('country', 'India'),
-            total_amount=cart.total_price
-        )
-        
-        # Create order items
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                book=item.book,
-                quantity=item.quantity,
-                price=item.book.price
+        if cart is None:
+            # The order code works from Cart rows
+            cart = materialize_cart(request)
+        try:
+            placed = place_order(
+                cart,
+                request.POST,
+                user=request.user if request.user.is_authenticated else None,
+                session_key=request.session.session_key if not request.user.is_authenticated else None,
             )
-        
+        except EmptyCart:
+            messages.warning(request, "Your cart is empty!")
+            return redirect('book_list')
+        except InsufficientStock as e:
+            messages.error(request, f"Sorry, some books no longer have enough stock: {', '.join(b.title for b in e.books)}")
+            return redirect('view_cart')
+        order = placed.order
+
         # Store order ID in session for payment
         request.session['order_id'] = order.id
         
         return redirect('payment', order_id=order.id)
     
+    total_items, total_price = cart_totals(cart_items)
     context = {
         'cart': cart,
         'cart_items': cart_items,
+        'total_items': total_items,
+        'total_price': total_price,
     }
     return render(request, 'bookstore/checkout.html', context)
 
@@ -208,13 +341,20 @@ def order_success(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     
 
-    cart = get_or_create_cart(request)
-    cart.items.all().delete()
+    try:
+        confirm_order(order)
+    except InsufficientStock as e:
+        messages.error(request, f"Your reservation expired and some books sold out: {', '.join(b.title for b in e.books)}")
+        return redirect('view_cart')
 
-    for item in order.items.all():
-        book = item.book
-        book.stock_quantity -= item.quantity
-        book.save()
+    if uses_cookie_cart(request):
+        get_cookie_cart(request).clear()
+        if request.session.session_key:
+            CartItem.objects.filter(cart__session_key=request.session.session_key).delete()
+    else:
+        cart = get_or_create_cart(request)
+        cart.items.all().delete()
+        invalidate_cart_count(cart)
     
     context = {
         'order': order,
@@ -224,30 +364,67 @@ def order_success(request, order_id):
 @staff_member_required
 def order_management(request):
     """Staff order management dashboard"""
-    orders = Order.objects.all().order_by('-created_at')
-    
+    orders = Order.objects.all()
+    status_filter = request.GET.get('status', '')
+    if status_filter:
+        orders = orders.filter(status=status_filter)
+    page = KeysetPaginator(orders, ('-created_at', '-id')).get_page(request.GET.get('cursor'))
+
+    summary = status_summary()
     context = {
-        'orders': orders,
-        'pending_count': orders.filter(status='pending').count(),
-        'processing_count': orders.filter(status='processing').count(),
-        'shipped_count': orders.filter(status='shipped').count(),
+        'orders': page.object_list,
+        'page': page,
+        'status_rows': [
+            {'value': value, 'label': label, **summary[value]} for value, label in Order.STATUS_CHOICES
+        ],
+        'status_choices': Order.STATUS_CHOICES,
+        'selected_status': status_filter,
+        'total_orders': sum(row['count'] for row in summary.values()),
+        'total_revenue': sum(row['revenue'] for status, row in summary.items() if status != 'cancelled'),
+        'pending_count': summary['pending']['count'],
+        'processing_count': summary['processing']['count'],
+        'shipped_count': summary['shipped']['count'],
     }
     return render(request, 'bookstore/order_management.html', context)
 
 @staff_member_required
-def update_order_status(request, order_id):
-    """Update order status"""
-    order = get_object_or_404(Order, id=order_id)
-    
-    if request.method == 'POST':
-        new_status = request.POST.get('status')
-        if new_status in ['pending', 'processing', 'shipped', 'delivered', 'cancelled']:
-            order.status = new_status
-            order.save()
-            messages.success(request, f'Order #{order.id} status updated to {order.get_status_display()}')
-    
+@require_POST
+def update_order_status(request, order_id=None):
+    """Update the status of one order, or of every id posted as order_ids"""
+    order_ids = [order_id] if order_id else request.POST.getlist('order_ids')
+    new_status = request.POST.get('status')
+    try:
+        order_ids = [int(i) for i in order_ids]
+        if not order_ids:
+            raise ValueError('No orders selected')
+        updated = set_order_status(order_ids, new_status)
+    except ValueError:
+        messages.error(request, 'Please choose a valid status and at least one order.')
+    else:
+        label = dict(Order.STATUS_CHOICES)[new_status]
+        messages.success(request, f'{updated} order{"s" if updated != 1 else ""} updated to {label}')
     return redirect('order_management')
 
+@staff_member_required
+def sales_report(request):
+    """Staff sales report read from the rollup tables"""
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    daily = daily_sales(days)
+    context = {
+        'days': days,
+        'day_options': [7, 30, 90, 365],
+        'daily': daily,
+        'total_orders': sum(row.orders for row in daily),
+        'total_units': sum(row.units for row in daily),
+        'total_revenue': sum(row.revenue for row in daily),
+        'top_books': BookSales.objects.select_related('book__author').filter(units__gt=0)[:20],
+        'top_categories': CategorySales.objects.select_related('category').filter(units__gt=0)[:20],
+    }
+    return render(request, 'bookstore/sales_report.html', context)
+
 def track_order(request):
     """Customer order tracking"""
     order = None
@@ -3,6 +3,10 @@ ASGI config for online_bookstore project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run with uvicorn, e.g.:
+
+    uvicorn online_bookstore.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +16,15 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'online_bookstore.settings')
+# Serve the catalog through bookstore.async_views unless explicitly disabled
+os.environ.setdefault('BOOKSTORE_ASYNC_VIEWS', '1')
+# Async views query from a fresh thread per request, so persistent
+# connections would never be reused and only pile up
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# Build the in-process autocomplete index before the first request
+from bookstore.autocomplete import warm_index  # noqa: E402
+
+warm_index()
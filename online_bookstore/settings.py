@@ -15,6 +15,7 @@ Django settings for online_bookstore project.
 """
 
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -26,6 +27,8 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-i34%*%ymgar!@@tplv(c%d*8t&
 
 DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = []
 if DEBUG:
     ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
@@ -59,12 +62,14 @@ if not DEBUG:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', 
+    'bookstore.middleware.StaticFilesMiddleware',
+    'bookstore.middleware.RequestInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'bookstore.middleware.CookieCartMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -72,7 +77,7 @@ ROOT_URLCONF = 'online_bookstore.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'bookstore.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,6 +87,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',  
+                'bookstore.context_processors.cart',
             ],
         },
     },
@@ -90,13 +96,89 @@ TEMPLATES = [
 WSGI_APPLICATION = 'online_bookstore.wsgi.application'
 
 # Database
+# SQLite tuned for several workers sharing one file. WAL lets readers run
+# alongside the single writer; IMMEDIATE transactions take the write lock
+# up front so a busy writer waits out the timeout instead of failing later
+# with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', 20000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+}
+SQLITE_OPTIONS = {
+    'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': SQLITE_OPTIONS,
+        # Persistent connections; asgi.py turns these off
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional second connection to the same file that refuses writes; catalog
+# reads are routed to it by bookstore.routers.CatalogReadRouter
+if os.getenv('DATABASE_READ_ONLY_ALIAS') == '1':
+    DATABASES['catalog_read'] = {
+        **DATABASES['default'],
+        'OPTIONS': {
+            'timeout': SQLITE_OPTIONS['timeout'],
+            'init_command': 'PRAGMA query_only=ON;' + ';'.join(
+                f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['bookstore.routers.CatalogReadRouter']
+
+# Cache
+# Fragment caches and cart counts must be shared by every gunicorn worker in
+# production: set REDIS_URL, or CACHE_LOCATION for a shared file-based cache.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'bookstore',
+        }
+    }
+elif os.getenv('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Logging
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'bookstore': {
+            'handlers': ['console'],
+            'level': os.getenv('BOOKSTORE_LOG_LEVEL', 'WARNING' if TESTING else 'INFO'),
+        },
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -143,6 +225,15 @@ else:
     }
     DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# How /media/ is delivered when DEBUG is off: 'django' (FileResponse with
+# ETag and Range support), 'x-accel-redirect' (nginx internal location at
+# BOOKSTORE_MEDIA_ACCEL_PREFIX, aliased to MEDIA_ROOT) or 'x-sendfile'
+BOOKSTORE_MEDIA_DELIVERY = os.getenv('BOOKSTORE_MEDIA_DELIVERY', 'django')
+BOOKSTORE_MEDIA_ACCEL_PREFIX = os.getenv('BOOKSTORE_MEDIA_ACCEL_PREFIX', '/protected-media/')
+BOOKSTORE_MEDIA_MAX_AGE = 60 * 60 * 24
+# Names carrying a content hash (name.0123456789ab.ext) are cached as immutable
+BOOKSTORE_MEDIA_IMMUTABLE_PATTERN = r'\.[0-9a-f]{12}\.\w+$'
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -152,3 +243,48 @@ if DEBUG:
     INTERNAL_IPS = ["127.0.0.1"]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Bookstore
+# Dotted path to a bookstore.search backend; None picks SQLite FTS5 when available
+BOOKSTORE_SEARCH_BACKEND = os.getenv('BOOKSTORE_SEARCH_BACKEND') or None
+BOOKSTORE_PAGE_SIZE = 24
+# Authors and categories shown with counts beside the catalog; cached per filter
+BOOKSTORE_FACET_SIZE = 15
+BOOKSTORE_FACET_TIMEOUT = 60 * 10
+# "Customers also bought" books stored per book
+BOOKSTORE_RECOMMENDATIONS_PER_BOOK = 6
+# Index keys the autocomplete endpoint looks at past the first match
+BOOKSTORE_AUTOCOMPLETE_SCAN = 200
+# Seconds before a worker rebuilds its autocomplete index in the background
+# even without a version bump; the backstop when the cache isn't shared
+BOOKSTORE_AUTOCOMPLETE_MAX_AGE = 60 * 5
+# Largest ?limit= the JSON API accepts; pages are streamed, not buffered
+BOOKSTORE_API_MAX_PAGE_SIZE = 1000
+# Unfiltered admin changelists of larger tables estimate their count from the id range
+BOOKSTORE_ADMIN_EXACT_COUNT_LIMIT = 100000
+# Catalog pages carry ETag/Last-Modified; browsers and proxies may reuse them
+# this many seconds before revalidating. The release id changes every ETag
+# on deploy, since templates may have changed.
+BOOKSTORE_PAGE_MAX_AGE = int(os.getenv('BOOKSTORE_PAGE_MAX_AGE', 0))
+BOOKSTORE_RELEASE = os.getenv('RENDER_GIT_COMMIT', '')
+BOOKSTORE_CART_COUNT_TIMEOUT = 60 * 60
+# 'cookie' keeps anonymous carts in a signed cookie until checkout or login;
+# 'database' stores every visitor's cart in Cart/CartItem rows
+BOOKSTORE_CART_BACKEND = os.getenv('BOOKSTORE_CART_BACKEND', 'cookie')
+BOOKSTORE_COOKIE_CART_AGE = 60 * 60 * 24 * 30
+BOOKSTORE_COOKIE_CART_MAX_LINES = 50
+# Seconds stock stays reserved between checkout and payment
+BOOKSTORE_RESERVATION_TTL = 30 * 60
+BOOKSTORE_THUMBNAIL_CACHE_TIMEOUT = 60 * 60 * 24
+# Request instrumentation: per-view query budgets keyed by URL name.
+# Overruns log a warning, or raise QueryBudgetExceeded when strict (the
+# budget tests turn that on).
+BOOKSTORE_SERVER_TIMING = True
+BOOKSTORE_DUPLICATE_QUERY_THRESHOLD = 3
+BOOKSTORE_QUERY_BUDGETS = {
+    'view_cart': 6,
+    'author_list': 4,
+}
+BOOKSTORE_QUERY_BUDGET_STRICT = os.getenv('BOOKSTORE_QUERY_BUDGET_STRICT', '') == '1'
+# Route the catalog to bookstore.async_views; asgi.py turns this on
+BOOKSTORE_ASYNC_VIEWS = os.getenv('BOOKSTORE_ASYNC_VIEWS', '') == '1'
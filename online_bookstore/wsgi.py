@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'online_bookstore.settings')
 
 application = get_wsgi_application()
+
+# Build the in-process autocomplete index before the first request
+from bookstore.autocomplete import warm_index  # noqa: E402
+
+warm_index()
@@ -0,0 +1,49 @@
+// Search-as-you-type for inputs with data-autocomplete-url
+document.querySelectorAll('input[data-autocomplete-url]').forEach(function(input) {
+    var menu = document.createElement('div');
+    menu.className = 'dropdown-menu w-100 shadow-sm';
+    input.parentNode.classList.add('position-relative');
+    input.parentNode.appendChild(menu);
+    var timer, latest = 0;
+
+    function hide() {
+        menu.classList.remove('show');
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < 2) {
+            hide();
+            return;
+        }
+        timer = setTimeout(function() {
+            var request = ++latest;
+            fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    // Answers can arrive out of order; keep only the newest
+                    if (request !== latest) return;
+                    menu.innerHTML = '';
+                    data.results.forEach(function(result) {
+                        var item = document.createElement('a');
+                        item.className = 'dropdown-item text-truncate';
+                        item.href = result.url;
+                        var icon = document.createElement('i');
+                        icon.className = 'fas me-2 text-muted ' + (result.type === 'book' ? 'fa-book' : 'fa-user');
+                        item.appendChild(icon);
+                        item.appendChild(document.createTextNode(result.label));
+                        menu.appendChild(item);
+                    });
+                    menu.classList.toggle('show', data.results.length > 0);
+                });
+        }, 120);
+    });
+
+    input.addEventListener('keydown', function(event) {
+        if (event.key === 'Escape') hide();
+    });
+    document.addEventListener('click', function(event) {
+        if (!input.parentNode.contains(event.target)) hide();
+    });
+});